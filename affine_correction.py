@@ -2,6 +2,7 @@ import numpy as np
 
 import chainer
 from chainer import cuda
+from chainer import functions
 from chainer import initializers
 from chainer import iterators
 from chainer import optimizers
@@ -24,9 +25,24 @@ class AffineTransformation(chainer.Chain):
             self.Q.initialize((3, 3))
 
     def __call__(self, M):
-        xp = cuda.get_array_module(M.data)
-        M = xp.array([xp.dot(M_, self.Q) for M_ in M])
-        return variable.Variable(M)
+        """
+        Calculate :math:`M_{f}Q` for all views at once
+
+        Args:
+            M: Motion matrices of shape (n_views, 2, 3)
+
+        Returns:
+            Transformed motion matrices of shape (n_views, 2, 3)
+        """
+        if isinstance(M, variable.Variable):
+            M = M.data
+        M = M.astype(self.Q.dtype, copy=False)
+
+        # (n_views, 2, 3) -> (2 * n_views, 3) so that the transformation is
+        # calculated by a single matrix product
+        F = M.shape[0]
+        M = functions.matmul(M.reshape(-1, 3), self.Q)
+        return functions.reshape(M, (F, 2, 3))
 
     def get_loss_func(self):
         """
@@ -39,9 +55,11 @@ class AffineTransformation(chainer.Chain):
         where :math:`||\cdot||_F` denotes the Frobenious norm and
         :math:`\hat{M}_{f}` is an estimated motion matrix corresponding to
         the :math:`f`-th view.
+        The loss is calculated for the whole batch by batched matrix
+        products so that the gradient propagates to Q.
 
         Args:
-            M: Stacked motion matrix of shape (2 * n_views, 3)
+            M: Motion matrices of shape (batchsize, 2, 3)
         """
 
         def f(M):
@@ -51,14 +69,11 @@ class AffineTransformation(chainer.Chain):
             M = self(M)
             F = M.shape[0]
 
-            I = xp.eye(2)
-
-            loss = 0
-            for M_ in M.data:
-                loss += xp.power(xp.dot(M_, M_.T) - I, 2).sum()
+            # batched M_f M_f^T of shape (n_views, 2, 2)
+            MMT = functions.matmul(M, M, transb=True)
+            I = xp.broadcast_to(xp.eye(2, dtype=MMT.dtype), MMT.shape)
 
-            if loss.data != 0:
-                loss = loss / F
+            loss = functions.sum(functions.square(MMT - I)) / F
 
             chainer.reporter.report({'loss': loss}, self)
 
@@ -115,10 +130,14 @@ class AffineCorrection:
         learning_rate (float): Learning rate
         epoch (int): Number of epochs
         batchsize (int): Batch size during training
+        verbose (bool): Print the loss and the reconstruction error
+            every epoch
     """
 
-    def __init__(self, X_eval=None, learning_rate=4e-3, epoch=8, batchsize=2):
+    def __init__(self, X_eval=None, learning_rate=4e-3, epoch=8, batchsize=2,
+                 verbose=True):
         self.model = AffineTransformation()
+        self.verbose = verbose
 
         self.X_eval = X_eval
         self.epoch = epoch
@@ -162,14 +181,15 @@ class AffineCorrection:
                 trigger=(1, 'epoch')
             )
 
-        trainer.extend(extensions.LogReport(trigger=log_interval))
-        trainer.extend(
-            extensions.PrintReport([
-                'epoch', 'iteration', 'main/loss',
-                'reconstruction_error'
-            ]),
-            trigger=log_interval
-        )
+        if self.verbose:
+            trainer.extend(extensions.LogReport(trigger=log_interval))
+            trainer.extend(
+                extensions.PrintReport([
+                    'epoch', 'iteration', 'main/loss',
+                    'reconstruction_error'
+                ]),
+                trigger=log_interval
+            )
 
         trainer.run()
 
@@ -211,7 +231,9 @@ class AffineCorrection:
         def reconstruction_error(X):
             X = self.transform_x(X[0], self.model.Q)
 
-            s, R, t = LeastSquaresRigidMotion(X, self.X_eval).solve()
+            # the reconstruction is determined up to a reflection
+            s, R, t = LeastSquaresRigidMotion(
+                X, self.X_eval, allow_reflection=True).solve()
             X = transform(s, R, t, X)
 
             error = frobenious_norm_squared(X - self.X_eval)
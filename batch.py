@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tomasi_kanade import TomasiKanade
+
+
+# Environment variables which limit the number of threads of BLAS backends
+THREAD_ENVIRONMENT_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+@contextmanager
+def blas_threads(n_threads):
+    """
+    Set the number of BLAS threads of processes started in this context.
+    The variables have to be set before the child processes import NumPy
+    """
+    original = {k: os.environ.get(k) for k in THREAD_ENVIRONMENT_VARIABLES}
+    os.environ.update({k: str(n_threads) for k in original})
+    try:
+        yield
+    finally:
+        for k, v in original.items():
+            if v is None:
+                del os.environ[k]
+            else:
+                os.environ[k] = v
+
+
+def to_shared_memory(W: np.ndarray):
+    """
+    Copy W to a new shared memory block
+
+    Returns:
+        tuple: (shm, descriptor) where ``descriptor`` is a picklable
+        (name, shape, dtype) tuple to attach the block from another process
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(W.nbytes, 1))
+    np.ndarray(W.shape, dtype=W.dtype, buffer=shm.buf)[:] = W
+    return shm, (shm.name, W.shape, W.dtype.str)
+
+
+def _reconstruct_shared(descriptor, options):
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        W = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        n_views, n_points = shape[0] // 2, shape[1]
+
+        tomasi_kanade = TomasiKanade(**options)
+        # (2 * n_views, n_points) -> (n_views, n_points, 2) without copy
+        tomasi_kanade.add_image_points_batch(
+            W.reshape(n_views, 2, n_points).transpose(0, 2, 1))
+        del W
+        return tomasi_kanade.run()
+    finally:
+        shm.close()
+
+
+def reconstruct_many(measurement_matrices, workers=None, threads_per_worker=1,
+                     **options):
+    """
+    Run :py:meth:`tomasi_kanade.TomasiKanade.run` for many independent
+    sequences in a process pool.
+
+    The measurement matrices are passed to the workers through shared memory
+    instead of being pickled, and at most ``2 * workers`` of them are kept in
+    shared memory at the same time.
+
+    Args:
+        measurement_matrices: Iterable of measurement matrices of shape
+            (2 * n_views, n_points). The rows may be uncentered
+        workers: Number of worker processes. Defaults to the number of CPUs
+        threads_per_worker: Number of BLAS threads in each worker
+        options: Keyword arguments passed to
+            :py:class:`tomasi_kanade.TomasiKanade`.
+            ``solver`` defaults to ``"linear"``
+
+    Yields:
+        tuple: (index, M, X) in the order of completion, where ``index``
+        is the position of the measurement matrix in the input
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    options.setdefault("solver", "linear")
+
+    # fork is unsafe after BLAS has started its threads
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    inputs = enumerate(measurement_matrices)
+    pending = {}
+
+    def submit():
+        try:
+            index, W = next(inputs)
+        except StopIteration:
+            return False
+        shm, descriptor = to_shared_memory(np.asarray(W))
+        future = executor.submit(_reconstruct_shared, descriptor, options)
+        pending[future] = (index, shm)
+        return True
+
+    try:
+        # workers are started on submission and inherit the environment
+        with blas_threads(threads_per_worker):
+            for _ in range(2 * workers):
+                if not submit():
+                    break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, shm = pending.pop(future)
+                shm.close()
+                shm.unlink()
+                M, X = future.result()
+                submit()
+                yield index, M, X
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        for index, shm in pending.values():
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,260 @@
+"""
+Headless benchmark of the reconstruction stages
+
+Each stage of the Tomasi-Kanade pipeline is timed separately on synthetic
+observations of a random point cloud, for every combination of the swept
+parameters. The results are written as JSON so that they can be compared
+between commits.
+
+Example:
+
+    $python3 benchmark.py --views 64 256 --points 1000 10000 \\
+        --output results.json
+
+The import time of the entry points is measured with ``--startup``.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from factorization import factorize
+from rigid_motion import (LeastSquaresRigidMotion, transform,
+                          random_rotation_matrices_3d, random_vectors_3d)
+from run_reconstruction import Object3D, normalize_object_size, take_pictures
+from tomasi_kanade import TomasiKanade
+
+
+def measure(function, repeat):
+    """
+    Run ``function`` ``repeat`` times
+
+    Returns:
+        tuple: (result, seconds, peak_bytes) where ``seconds`` is the
+        shortest wall time and ``peak_bytes`` is the peak memory allocated
+        during an additional traced run
+    """
+    seconds = np.inf
+    for i in range(repeat):
+        begin = time.perf_counter()
+        result = function()
+        seconds = min(seconds, time.perf_counter() - begin)
+
+    tracemalloc.start()
+    function()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, seconds, peak_bytes
+
+
+def reconstruction_error(X, X_true):
+    """
+    RMS distance between the reconstructed points and the ground truth
+    after the similarity transformation which aligns them
+    """
+    rigid_motion = LeastSquaresRigidMotion(X, X_true, allow_reflection=True)
+    s, R, t = rigid_motion.solve()
+    X = transform(s, R, t, X)
+    return float(np.sqrt(np.mean(np.sum(np.square(X - X_true), axis=1))))
+
+
+def run_case(n_views, n_points, noise_std, dtype, method, solver, repeat):
+    """Benchmark the stages for one combination of the parameters"""
+    X_true = normalize_object_size(np.random.normal(size=(n_points, 3)))
+    R = random_rotation_matrices_3d(n_views)
+    t = random_vectors_3d(n_views)
+    intrinsic_parameters = np.array([
+        [1, 0, 0],
+        [0, 1, 0]
+    ])
+    image_points = take_pictures(Object3D(X_true), intrinsic_parameters,
+                                 R, t, noise_std)
+    image_points = image_points.transpose(0, 2, 1)
+
+    stages = {}
+
+    def build():
+        tomasi_kanade = TomasiKanade(method=method, solver=solver,
+                                     dtype=dtype)
+        tomasi_kanade.add_image_points_batch(image_points)
+        return tomasi_kanade.measurement_matrix
+
+    W, *stages['measurement_matrix'] = measure(build, repeat)
+    f, *stages['factorization'] = measure(
+        lambda: factorize(W, 3, method), repeat)
+
+    M = f.U * f.s
+    X = f.VT
+    k = np.linalg.norm(M, axis=1).mean()
+    M, X = M / k, (X * k).T
+
+    def optimize():
+        # the SGD solver keeps training a model across calls of optimize,
+        # so each measured call starts from a new correction
+        tomasi_kanade = TomasiKanade(method=method, solver=solver,
+                                     dtype=dtype, verbose=False)
+        correction = tomasi_kanade.affine_correction
+        correction.optimize(M, X)
+        return correction
+
+    correction, *stages['affine_correction'] = measure(optimize, repeat)
+    M, X = correction(M, X)
+
+    _, *stages['rigid_motion'] = measure(
+        lambda: LeastSquaresRigidMotion(
+            X, X_true, allow_reflection=True).solve(),
+        repeat)
+
+    error = reconstruction_error(X, X_true)
+
+    # accuracy loss against the double precision pipeline on the same data
+    error_float64 = error
+    if np.dtype(dtype) != np.float64:
+        tomasi_kanade = TomasiKanade(method=method, solver=solver,
+                                     dtype=np.float64, verbose=False)
+        tomasi_kanade.add_image_points_batch(image_points)
+        _, X64 = tomasi_kanade.run()
+        error_float64 = reconstruction_error(X64, X_true)
+
+    return {
+        'n_views': n_views,
+        'n_points': n_points,
+        'noise_std': noise_std,
+        'dtype': np.dtype(dtype).name,
+        'method': method,
+        'solver': solver,
+        'stages': {
+            name: {'seconds': seconds, 'peak_bytes': peak_bytes}
+            for name, (seconds, peak_bytes) in stages.items()
+        },
+        'discarded_energy': f.discarded_energy,
+        'reconstruction_error': error,
+        'reconstruction_error_float64': error_float64,
+    }
+
+
+# The subprocesses run here so that the modules and the git repository are
+# found regardless of the working directory of the caller
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose import time is measured by --startup
+STARTUP_MODULES = ('tomasi_kanade', 'run_reconstruction', 'batch',
+                   'affine_correction')
+
+
+def import_seconds(module, repeat):
+    """
+    Shortest wall time of starting a fresh interpreter which imports
+    ``module``, or None if the module cannot be imported
+    """
+    seconds = np.inf
+    for i in range(repeat):
+        begin = time.perf_counter()
+        returncode = subprocess.call(
+            [sys.executable, '-c', 'import {}'.format(module)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            cwd=REPOSITORY_DIRECTORY)
+        if returncode != 0:
+            return None
+        seconds = min(seconds, time.perf_counter() - begin)
+    return seconds
+
+
+def run_startup(repeat):
+    """
+    Measure the import time of the entry points in excess of the time to
+    start an interpreter which imports NumPy only
+    """
+    baseline = import_seconds('numpy', repeat)
+    results = {'numpy': baseline}
+    for module in STARTUP_MODULES:
+        seconds = import_seconds(module, repeat)
+        results[module] = seconds
+        print('{}: {}'.format(
+            module,
+            'not importable' if seconds is None else
+            '{:.4f}s (+{:.4f}s over numpy)'.format(seconds,
+                                                   seconds - baseline)))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+            cwd=REPOSITORY_DIRECTORY).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--views', type=int, nargs='+', default=[128])
+    parser.add_argument('--points', type=int, nargs='+', default=[1000])
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0])
+    parser.add_argument('--dtypes', nargs='+', default=['float64'])
+    parser.add_argument('--method', default='economy')
+    parser.add_argument('--solver', default='linear')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure the import time of the entry points '
+                             'instead of the reconstruction stages')
+    parser.add_argument('--output', default=None,
+                        help='Path to the JSON file to be written')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    np.random.seed(args.seed)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+    if args.startup:
+        report['startup'] = run_startup(args.repeat)
+    else:
+        report['results'] = run_sweep(args)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+def run_sweep(args):
+    results = []
+    cases = itertools.product(args.views, args.points, args.noise,
+                              args.dtypes)
+    for n_views, n_points, noise_std, dtype in cases:
+        result = run_case(n_views, n_points, noise_std, dtype,
+                          args.method, args.solver, args.repeat)
+        results.append(result)
+
+        times = ' '.join('{}={:.4f}s'.format(name, stage['seconds'])
+                         for name, stage in result['stages'].items())
+        print('views={} points={} noise={} dtype={} {} error={:.3e} '
+              '(float64: {:.3e})'.format(
+                  n_views, n_points, noise_std, result['dtype'], times,
+                  result['reconstruction_error'],
+                  result['reconstruction_error_float64']))
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+import numpy as np
+
+from missing_data import accumulate
+from rigid_motion import decompose_motion
+
+
+# number of parameters of a view (rotation, scale and translation)
+# and of a point
+N_VIEW_PARAMETERS = 6
+N_POINT_PARAMETERS = 3
+
+
+def cross_product_matrices(v: np.ndarray) -> np.ndarray:
+    """
+    Matrices :math:`[\\mathbf{v}]_{\\times}` of shape (n, 3, 3) such that
+    :math:`[\\mathbf{v}]_{\\times}\\mathbf{u} = \\mathbf{v} \\times
+    \\mathbf{u}` for vectors v of shape (n, 3)
+    """
+    K = np.zeros(v.shape[:-1] + (3, 3), dtype=v.dtype)
+    K[..., 0, 1], K[..., 0, 2] = -v[..., 2], v[..., 1]
+    K[..., 1, 0], K[..., 1, 2] = v[..., 2], -v[..., 0]
+    K[..., 2, 0], K[..., 2, 1] = -v[..., 1], v[..., 0]
+    return K
+
+
+def rodrigues(omega: np.ndarray) -> np.ndarray:
+    """
+    Rotation matrices of shape (n, 3, 3) corresponding to
+    rotation vectors of shape (n, 3)
+    """
+    theta = np.linalg.norm(omega, axis=-1)[..., np.newaxis, np.newaxis]
+    K = cross_product_matrices(omega)
+
+    # Taylor expansions are used for small angles to avoid 0 / 0
+    small = theta < 1e-6
+    theta_ = np.where(small, 1, theta)
+    a = np.where(small, 1 - np.square(theta) / 6, np.sin(theta_) / theta_)
+    b = np.where(small, 0.5 - np.square(theta) / 24,
+                 (1 - np.cos(theta_)) / np.square(theta_))
+    return np.eye(3) + a * K + b * np.matmul(K, K)
+
+
+def project(R, s, t, X, view_indices, point_indices):
+    """
+    Project the points by the scaled orthographic cameras
+    :math:`\\mathbf{x}_{fn} = s_{f}R_{f}^{(2)}\\mathbf{X}_{n} +
+    \\mathbf{t}_{f}` where :math:`R_{f}^{(2)}` is the first 2 rows of
+    :math:`R_{f}`
+
+    Returns:
+        tuple: (x, P) where ``x`` is of shape (n_observations, 2) and
+        ``P`` of shape (n_observations, 3) is the rotated points
+    """
+    P = np.einsum('kij,kj->ki', R[view_indices], X[point_indices])
+    x = s[view_indices, np.newaxis] * P[:, 0:2] + t[view_indices]
+    return x, P
+
+
+def jacobians(R, s, P, view_indices):
+    """
+    Jacobians of the projections with respect to the parameters of the view
+    and of the point of each observation.
+
+    The rotation of each view is updated as
+    :math:`R_{f} \\leftarrow \\exp([\\boldsymbol{\\omega}]_{\\times})R_{f}`
+
+    Returns:
+        tuple: (A, B) where ``A`` of shape (n_observations, 2, 6) is
+        with respect to :math:`(\\boldsymbol{\\omega}, s, \\mathbf{t})` and
+        ``B`` of shape (n_observations, 2, 3) is with respect to
+        :math:`\\mathbf{X}`
+    """
+    n_observations = P.shape[0]
+    s_ = s[view_indices, np.newaxis, np.newaxis]
+
+    A = np.zeros((n_observations, 2, N_VIEW_PARAMETERS))
+    A[:, :, 0:3] = -s_ * cross_product_matrices(P)[:, 0:2]
+    A[:, :, 3] = P[:, 0:2]
+    A[:, 0, 4] = A[:, 1, 5] = 1
+
+    B = s_ * R[view_indices, 0:2]
+    return A, B
+
+
+def conjugate_gradient(apply, b, preconditioner, tol=1e-6, max_iter=100):
+    """
+    Solve :math:`S\\mathbf{x} = \\mathbf{b}` by the preconditioned conjugate
+    gradient method without forming S
+
+    Args:
+        apply: Function which calculates :math:`S\\mathbf{x}`
+        b: Right hand side of shape (n, d)
+        preconditioner: Function which applies the preconditioner
+        tol: Tolerance of the residual norm relative to that of b
+        max_iter: Maximum number of iterations
+
+    Returns:
+        Solution of the same shape as b
+    """
+    x = np.zeros_like(b)
+    r = b.copy()
+    z = preconditioner(r)
+    p = z.copy()
+    rz = np.sum(r * z)
+    threshold = tol * np.linalg.norm(b)
+    for i in range(max_iter):
+        if np.linalg.norm(r) <= threshold:
+            break
+        Sp = apply(p)
+        alpha = rz / np.sum(p * Sp)
+        x += alpha * p
+        r -= alpha * Sp
+        z = preconditioner(r)
+        rz_new = np.sum(r * z)
+        p = z + (rz_new / rz) * p
+        rz = rz_new
+    return x
+
+
+def solve_reduced_camera_system(A, B, r, view_indices, point_indices,
+                                n_views, n_points, damping,
+                                cg_tol, cg_max_iter):
+    """
+    Solve the damped normal equations of the Gauss-Newton step by
+    eliminating the point parameters with the Schur complement.
+
+    The reduced camera system
+    :math:`(H_{cc} - H_{cp}H_{pp}^{-1}H_{pc})\\delta_{c} = \\mathbf{b}`
+    is solved by the conjugate gradient method preconditioned by its
+    block diagonal. The products with the reduced matrix are calculated per
+    observation, so no matrix of size (n_views + n_points) squared is formed
+
+    Returns:
+        tuple: Steps of the views of shape (n_views, 6) and of the points
+        of shape (n_points, 3)
+    """
+    v, p = view_indices, point_indices
+
+    H_cc = accumulate(v, n_views, np.matmul(A.transpose(0, 2, 1), A))
+    H_pp = accumulate(p, n_points, np.matmul(B.transpose(0, 2, 1), B))
+    C = np.matmul(A.transpose(0, 2, 1), B)  # blocks of H_cp
+
+    # Marquardt damping scales the diagonal, which is invariant to the
+    # units of the parameters
+    for H in (H_cc, H_pp):
+        diagonal = np.einsum('kii->ki', H)
+        diagonal *= 1 + damping
+        diagonal += np.finfo(np.float64).eps
+
+    g_c = accumulate(v, n_views, np.einsum('kji,kj->ki', A, r))
+    g_p = accumulate(p, n_points, np.einsum('kji,kj->ki', B, r))
+
+    H_pp_inv = np.linalg.inv(H_pp)
+    CH = np.matmul(C, H_pp_inv[p])  # H_cp H_pp^{-1} per observation
+
+    def apply(x):
+        y = accumulate(p, n_points, np.einsum('kji,kj->ki', C, x[v]))
+        return (np.einsum('fij,fj->fi', H_cc, x) -
+                accumulate(v, n_views, np.einsum('kij,kj->ki', CH, y[p])))
+
+    S_diagonal = H_cc - accumulate(
+        v, n_views, np.matmul(CH, C.transpose(0, 2, 1)))
+    S_diagonal_inv = np.linalg.inv(S_diagonal)
+
+    def preconditioner(x):
+        return np.einsum('fij,fj->fi', S_diagonal_inv, x)
+
+    b = -g_c + accumulate(v, n_views, np.einsum('kij,kj->ki', CH, g_p[p]))
+    delta_c = conjugate_gradient(apply, b, preconditioner,
+                                 cg_tol, cg_max_iter)
+
+    z = -g_p - accumulate(p, n_points,
+                          np.einsum('kji,kj->ki', C, delta_c[v]))
+    delta_p = np.einsum('nij,nj->ni', H_pp_inv, z)
+    return delta_c, delta_p
+
+
+def bundle_adjustment(image_points, view_indices, point_indices,
+                      R, s, t, X, weights=None, max_iter=50, tol=1e-10,
+                      damping=1e-3, cg_tol=1e-6, cg_max_iter=100):
+    """
+    Refine scaled orthographic cameras and 3D points by minimizing the
+    reprojection error with the Levenberg-Marquardt method.
+
+    Each iteration costs time and memory proportional to the number of
+    observations, since the Jacobian is held as one block per observation
+    and the reduced camera system is solved matrix-free.
+    See :py:func:`solve_reduced_camera_system`
+
+    Args:
+        image_points: Observed image points of shape (n_observations, 2)
+        view_indices: View of each observation of shape (n_observations,)
+        point_indices: Point of each observation of shape (n_observations,)
+        R: Initial rotation matrices of shape (n_views, 3, 3)
+        s: Initial scales of shape (n_views,)
+        t: Initial translations of shape (n_views, 2)
+        X: Initial 3D points of shape (n_points, 3)
+        weights: Weights of the observations of shape (n_observations,).
+            The squared reprojection errors are multiplied by them, so that
+            observations with small weights, such as the outliers found by
+            :py:func:`robust.robust_factorization`, have little effect
+        max_iter: Maximum number of iterations
+        tol: The iteration stops when the relative decrease of the cost
+            is smaller than this value
+        damping: Initial damping parameter
+        cg_tol: Relative tolerance of the conjugate gradient method
+        cg_max_iter: Maximum number of conjugate gradient iterations
+
+    Returns:
+        tuple: (R, s, t, X, cost, n_iter) where ``cost`` is the weighted
+        sum of squared reprojection errors
+    """
+    n_views, n_points = R.shape[0], X.shape[0]
+    R, s, t, X = (np.array(a, dtype=np.float64) for a in (R, s, t, X))
+
+    # the residuals and the Jacobians are scaled by the square roots of
+    # the weights. The weights are bounded below so that points whose
+    # observations all have zero weight keep a nonsingular block
+    if weights is None:
+        sqrt_weights = np.ones((len(view_indices), 1))
+    else:
+        sqrt_weights = np.sqrt(np.maximum(weights, 1e-8))[:, np.newaxis]
+
+    def residuals(R, s, t, X):
+        x, P = project(R, s, t, X, view_indices, point_indices)
+        return sqrt_weights * (x - image_points), P
+
+    r, P = residuals(R, s, t, X)
+    cost = np.sum(np.square(r))
+
+    n_iter = max_iter
+    for i in range(max_iter):
+        A, B = jacobians(R, s, P, view_indices)
+        A = sqrt_weights[:, :, np.newaxis] * A
+        B = sqrt_weights[:, :, np.newaxis] * B
+        delta_c, delta_p = solve_reduced_camera_system(
+            A, B, r, view_indices, point_indices, n_views, n_points,
+            damping, cg_tol, cg_max_iter)
+
+        R_new = np.matmul(rodrigues(delta_c[:, 0:3]), R)
+        s_new = s + delta_c[:, 3]
+        t_new = t + delta_c[:, 4:6]
+        X_new = X + delta_p
+
+        r_new, P_new = residuals(R_new, s_new, t_new, X_new)
+        cost_new = np.sum(np.square(r_new))
+
+        if cost_new < cost:
+            decrease = (cost - cost_new) / cost
+            R, s, t, X, r, P = R_new, s_new, t_new, X_new, r_new, P_new
+            cost = cost_new
+            damping /= 10
+            if decrease < tol:
+                n_iter = i + 1
+                break
+        else:
+            damping *= 10
+            if damping > 1e16:
+                n_iter = i + 1
+                break
+
+    return R, s, t, X, cost, n_iter
+
+
+def refine_reconstruction(W, M, X, visibility=None, offsets=None,
+                          point_weights=None, view_weights=None, **options):
+    """
+    Refine the output of the factorization by
+    :py:func:`bundle_adjustment` against the measurement matrix
+
+    Args:
+        W: Measurement matrix of shape (2 * n_views, n_points)
+        M: Motion matrix of shape (2 * n_views, 3)
+        X: 3D points of shape (n_points, 3)
+        visibility: Boolean array of shape (n_views, n_points) which is
+            True where the point is observed. All points are observed if None
+        offsets: Offsets of the rows of W of shape (2 * n_views,),
+            used as the initial translations
+        point_weights: Weights of the points of shape (n_points,)
+        view_weights: Weights of the views of shape (n_views,).
+            The weight of each observation is the product of the weights of
+            its point and its view
+        options: Options passed to :py:func:`bundle_adjustment`
+
+    Returns:
+        tuple: (M, X, t) where ``t`` of shape (n_views, 2) is the
+        translations of the views
+    """
+    n_views, n_points = W.shape[0] // 2, W.shape[1]
+    if visibility is None:
+        visibility = np.ones((n_views, n_points), dtype=bool)
+
+    view_indices, point_indices = np.nonzero(visibility)
+    image_points = W.reshape(n_views, 2, n_points)[
+        view_indices, :, point_indices]
+
+    R, s = decompose_motion(M)
+    if offsets is None:
+        t = np.zeros((n_views, 2))
+    else:
+        t = offsets.reshape(n_views, 2)
+
+    weights = None
+    if point_weights is not None or view_weights is not None:
+        weights = np.ones(len(view_indices))
+        if point_weights is not None:
+            weights = weights * point_weights[point_indices]
+        if view_weights is not None:
+            weights = weights * view_weights[view_indices]
+
+    R, s, t, X, _, _ = bundle_adjustment(
+        image_points, view_indices, point_indices, R, s, t, X, weights,
+        **options)
+
+    M = (s[:, np.newaxis, np.newaxis] * R[:, 0:2]).reshape(-1, 3)
+    return M, X, t
@@ -0,0 +1,104 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_hash(*arrays, **options) -> str:
+    """
+    Hash of the contents, shapes and dtypes of the arrays and the options.
+    None is accepted in place of an array
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr(sorted(options.items())).encode())
+    for array in arrays:
+        if array is None:
+            h.update(b'None')
+            continue
+        array = np.ascontiguousarray(array)
+        h.update(repr((array.shape, array.dtype.str)).encode())
+        h.update(array.data)
+    return h.hexdigest()
+
+
+class FactorizationCache(object):
+    """
+    LRU cache of factorization results keyed by the content of the
+    measurement matrix and the factorization options.
+    Each entry holds the normalized rank-3 factors M and X, the
+    normalization constant k and the other outputs of the factorization,
+    such as the offsets and the weights of the robust factorization.
+
+    Args:
+        maxsize (int): Maximum number of entries kept in memory
+        directory (str): If given, entries are also stored in this
+            directory as ``.npz`` files and loaded on a miss in memory
+    """
+
+    def __init__(self, maxsize=16, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (M, X, k, outputs) where ``outputs`` is the dict given
+            to :py:meth:`put`, or None if ``key`` is not cached
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if self.directory is not None and os.path.exists(self.path(key)):
+            with np.load(self.path(key)) as data:
+                outputs = {
+                    name: data[name][()] if data[name].ndim == 0
+                    else data[name]
+                    for name in data.files if name not in ('M', 'X', 'k')
+                }
+                entry = (data['M'], data['X'], float(data['k']), outputs)
+            self.store(key, entry)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key, M: np.ndarray, X: np.ndarray, k: float, **outputs):
+        """
+        Add the normalized factors M, X, the constant k and the other
+        outputs of the factorization given as arrays, scalars or None.
+        Outputs which are None are not written to the disk, and they are
+        missing from the entries loaded from the disk
+        """
+        entry = (M, X, k, outputs)
+        self.store(key, entry)
+        if self.directory is not None:
+            arrays = {name: value for name, value in outputs.items()
+                      if value is not None}
+            np.savez(self.path(key), M=M, X=X, k=k, **arrays)
+
+    def store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Remove the entries in memory. Files on disk are kept"""
+        self.entries.clear()
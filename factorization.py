@@ -0,0 +1,215 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+# Use the Gram matrix of the smaller dimension when the measurement matrix
+# is at least this many times longer in one dimension than in the other
+GRAM_ASPECT_RATIO = 4
+
+METHODS = ("full", "economy", "gram", "randomized", "lanczos")
+
+
+class Factorization(NamedTuple):
+    """
+    Truncated singular value decomposition :math:`W \\approx U S V^{\\top}`
+
+    Attributes:
+        U: Left singular vectors of shape (n_rows, rank)
+        s: Singular values of shape (rank,) in descending order
+        VT: Right singular vectors of shape (rank, n_columns)
+        discarded_energy: Fraction of the spectral energy
+            :math:`||W||_{F}^{2}` which is not explained by the truncated
+            factors. This is 0 if W is exactly of rank ``rank``
+    """
+    U: np.ndarray
+    s: np.ndarray
+    VT: np.ndarray
+    discarded_energy: float
+
+
+def squared_norm(W: np.ndarray) -> float:
+    """
+    Calculate :math:`||W||_{F}^{2}` in double precision
+    without allocating a copy of W
+    """
+    return float(np.einsum('ij,ij->', W, W, dtype=np.float64))
+
+
+def discarded_energy(W: np.ndarray, s: np.ndarray) -> float:
+    """
+    Calculate the fraction of :math:`||W||_{F}^{2}` which is not explained
+    by the singular values ``s``
+    """
+    total = squared_norm(W)
+    if total == 0:
+        return 0.0
+    return max(total - float(np.sum(np.square(s))), 0.0) / total
+
+
+def full_svd(W, rank):
+    U, s, VT = np.linalg.svd(W, full_matrices=True)
+    return U[:, :rank], s[:rank], VT[:rank]
+
+
+def economy_svd(W, rank):
+    m, n = W.shape
+    if max(m, n) >= GRAM_ASPECT_RATIO * min(m, n):
+        return gram_svd(W, rank)
+    U, s, VT = np.linalg.svd(W, full_matrices=False)
+    return U[:, :rank], s[:rank], VT[:rank]
+
+
+def gram_svd(W, rank):
+    """
+    Calculate the top singular triplets from the eigendecomposition of
+    :math:`WW^{\\top}` or :math:`W^{\\top}W`, whichever is smaller
+    """
+    m, n = W.shape
+    transposed = n < m
+    if transposed:
+        W = W.T
+
+    G = np.dot(W, W.T)
+    eigenvalues, eigenvectors = np.linalg.eigh(G)
+
+    # eigh returns eigenvalues in ascending order
+    eigenvalues = eigenvalues[::-1][:rank]
+    U = eigenvectors[:, ::-1][:, :rank]
+
+    s = np.sqrt(np.clip(eigenvalues, 0, None))
+    VT = np.dot(U.T, W)
+    nonzero = s > 0
+    VT[nonzero] /= s[nonzero, np.newaxis]
+
+    if transposed:
+        return VT.T, s, U.T
+    return U, s, VT
+
+
+def randomized_svd(W, rank, n_oversamples=10, n_power_iterations=2,
+                   seed=None):
+    """
+    Randomized range finder followed by an SVD of the projected matrix.
+    See :cite:`halko2011finding`
+    """
+    m, n = W.shape
+    k = min(rank + n_oversamples, m, n)
+
+    rng = np.random.RandomState(seed)
+    Omega = rng.standard_normal((n, k)).astype(W.dtype, copy=False)
+
+    Y, _ = np.linalg.qr(np.dot(W, Omega))
+    for i in range(n_power_iterations):
+        Z, _ = np.linalg.qr(np.dot(W.T, Y))
+        Y, _ = np.linalg.qr(np.dot(W, Z))
+
+    B = np.dot(Y.T, W)
+    U, s, VT = np.linalg.svd(B, full_matrices=False)
+    return np.dot(Y, U[:, :rank]), s[:rank], VT[:rank]
+
+
+def lanczos_svd(W, rank, n_steps=None, seed=None):
+    """
+    Golub-Kahan-Lanczos bidiagonalization with full reorthogonalization.
+    Only matrix-vector products with W are required
+    """
+    m, n = W.shape
+    if n_steps is None:
+        n_steps = 3 * rank + 10
+    k = min(n_steps, m, n)
+
+    U = np.zeros((m, k), dtype=W.dtype)
+    V = np.zeros((n, k), dtype=W.dtype)
+    alpha = np.zeros(k, dtype=W.dtype)
+    beta = np.zeros(k, dtype=W.dtype)
+
+    rng = np.random.RandomState(seed)
+    v = rng.standard_normal(n).astype(W.dtype, copy=False)
+    v = v / np.linalg.norm(v)
+
+    # breakdown threshold relative to the largest possible singular value
+    tolerance = np.finfo(W.dtype).eps * np.sqrt(squared_norm(W))
+
+    u_prev = np.zeros(m, dtype=W.dtype)
+    n_done = k
+    for j in range(k):
+        V[:, j] = v
+        u = np.dot(W, v)
+        if j > 0:
+            u = u - beta[j-1] * u_prev
+        # reorthogonalize twice to keep the basis orthonormal
+        for _ in range(2):
+            u = u - np.dot(U[:, :j], np.dot(U[:, :j].T, u))
+        alpha[j] = np.linalg.norm(u)
+        if alpha[j] <= tolerance:
+            n_done = j
+            break
+        u = u / alpha[j]
+        U[:, j] = u
+        u_prev = u
+
+        v = np.dot(W.T, u) - alpha[j] * v
+        for _ in range(2):
+            v = v - np.dot(V[:, :j+1], np.dot(V[:, :j+1].T, v))
+        beta[j] = np.linalg.norm(v)
+        if beta[j] <= tolerance:
+            n_done = j + 1
+            break
+        v = v / beta[j]
+
+    # W V = U B where B is upper bidiagonal
+    k = n_done
+    B = np.diag(alpha[:k]) + np.diag(beta[:max(k-1, 0)], 1)
+    Ub, s, VbT = np.linalg.svd(B.reshape(k, k))
+
+    rank_ = min(rank, k)
+    U = np.dot(U[:, :k], Ub[:, :rank_])
+    VT = np.dot(VbT[:rank_], V[:, :k].T)
+    s = s[:rank_]
+    if rank_ < rank:  # W has rank lower than requested
+        U = np.hstack((U, np.zeros((m, rank - rank_), dtype=W.dtype)))
+        VT = np.vstack((VT, np.zeros((rank - rank_, n), dtype=W.dtype)))
+        s = np.concatenate((s, np.zeros(rank - rank_, dtype=W.dtype)))
+    return U, s, VT
+
+
+def factorize(W: np.ndarray, rank: int = 3,
+              method: str = "economy") -> Factorization:
+    """
+    Calculate the rank-``rank`` truncated SVD of W.
+    The factors have the same dtype as W
+
+    Args:
+        W: Matrix to be factorized, typically the measurement matrix
+            of shape (2 * n_views, n_points)
+        rank: Number of singular triplets to be computed
+        method: Factorization backend. One of
+
+            - ``"full"``: :py:func:`numpy.linalg.svd` with full matrices.
+              Requires :math:`O(N^2)` memory
+            - ``"economy"``: Thin SVD, or the eigendecomposition of the
+              smaller Gram matrix if one dimension of W is small
+            - ``"gram"``: Eigendecomposition of the smaller Gram matrix
+            - ``"randomized"``: Randomized range finder
+            - ``"lanczos"``: Golub-Kahan-Lanczos bidiagonalization
+
+    Returns:
+        Factorization: Truncated factors and the rank-fit diagnostic
+    """
+    if method == "full":
+        U, s, VT = full_svd(W, rank)
+    elif method == "economy":
+        U, s, VT = economy_svd(W, rank)
+    elif method == "gram":
+        U, s, VT = gram_svd(W, rank)
+    elif method == "randomized":
+        U, s, VT = randomized_svd(W, rank)
+    elif method == "lanczos":
+        U, s, VT = lanczos_svd(W, rank)
+    else:
+        raise ValueError(
+            "method must be one of {}, but got '{}'".format(METHODS, method)
+        )
+
+    return Factorization(U, s, VT, discarded_energy(W, s))
@@ -0,0 +1,138 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class StageRecord(object):
+    """
+    Measurements of one execution of a stage
+
+    Attributes:
+        name (str): Name of the stage
+        seconds (float): Wall time
+        shapes (list): Shapes of the arrays produced by the stage
+        nbytes (int): Total bytes of the arrays produced by the stage
+        peak_bytes (int): Peak memory allocated during the stage.
+            This is None unless the profiler traces memory
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = None
+        self.shapes = []
+        self.nbytes = 0
+        self.peak_bytes = None
+
+    def observe(self, *arrays):
+        """Record the shapes and the sizes of the arrays"""
+        for array in arrays:
+            self.shapes.append(tuple(array.shape))
+            self.nbytes += array.nbytes
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'seconds': self.seconds,
+            'shapes': self.shapes,
+            'nbytes': self.nbytes,
+            'peak_bytes': self.peak_bytes,
+        }
+
+
+class NullRecord(object):
+    """Record which ignores everything, used when profiling is disabled"""
+
+    def observe(self, *arrays):
+        pass
+
+
+NULL_STAGE = nullcontext(NullRecord())
+
+
+class Profiler(object):
+    """
+    Collect the wall time, the array shapes and the allocated bytes of
+    each stage of the reconstruction
+
+    Examples:
+
+    >>> profiler = Profiler()
+    >>> tomasi_kanade = TomasiKanade(profiler=profiler)
+    >>> ...
+    >>> M, X = tomasi_kanade.run()
+    >>> print(profiler.to_json())
+
+    Args:
+        callback: Function called with a :py:class:`StageRecord`
+            every time a stage finishes
+        trace_memory (bool): Measure the peak memory of each stage with
+            :py:mod:`tracemalloc`. This slows down the stages
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        """Context which measures the stage ``name``"""
+        record = StageRecord(name)
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            begin_bytes, _ = tracemalloc.get_traced_memory()
+
+        begin = time.perf_counter()
+        yield record
+        record.seconds = time.perf_counter() - begin
+
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            record.peak_bytes = peak - begin_bytes
+
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        """
+        Aggregate the records by stage name
+
+        Returns:
+            dict: Stage name to the number of calls, the total wall time
+            and the total bytes produced
+        """
+        summary = {}
+        for record in self.records:
+            s = summary.setdefault(
+                record.name, {'calls': 0, 'seconds': 0.0, 'nbytes': 0})
+            s['calls'] += 1
+            s['seconds'] += record.seconds
+            s['nbytes'] += record.nbytes
+        return summary
+
+    def to_dict(self):
+        return {
+            'stages': [record.to_dict() for record in self.records],
+            'summary': self.summary(),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def clear(self):
+        self.records = []
+
+
+def stage(profiler, name):
+    """
+    Return ``profiler.stage(name)``, or a no-op context which yields a
+    :py:class:`NullRecord` if ``profiler`` is None
+    """
+    if profiler is None:
+        return NULL_STAGE
+    return profiler.stage(name)
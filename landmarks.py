@@ -0,0 +1,152 @@
+import numpy as np
+
+from factorization import squared_norm
+
+
+LANDMARK_METHODS = ("random", "farthest", "leverage")
+
+
+def sketch_columns(W: np.ndarray, n_components: int, seed=None):
+    """
+    Project the columns of W of shape (n_rows, n_columns) onto
+    ``n_components`` random directions
+
+    Returns:
+        Sketch of shape (n_components, n_columns)
+    """
+    rng = np.random.RandomState(seed)
+    Omega = rng.standard_normal((n_components, W.shape[0]))
+    return np.dot(Omega.astype(W.dtype, copy=False), W)
+
+
+def farthest_point_sampling(Y: np.ndarray, n_samples: int) -> np.ndarray:
+    """
+    Greedily choose the columns of Y which are farthest from the columns
+    already chosen. This costs :math:`O(n_{samples}n_{columns}d)`
+    for Y of shape (d, n_columns)
+    """
+    indices = np.empty(n_samples, dtype=np.int64)
+    norms = np.sum(np.square(Y), axis=0)
+
+    def squared_distances(y):
+        # expanded so that each step is one matrix-vector product
+        return norms - 2 * np.dot(y, Y) + np.dot(y, y)
+
+    # start from the column farthest from the centroid
+    indices[0] = np.argmax(squared_distances(Y.mean(axis=1)))
+    distances = squared_distances(Y[:, indices[0]])
+    for i in range(1, n_samples):
+        indices[i] = np.argmax(distances)
+        np.minimum(distances, squared_distances(Y[:, indices[i]]),
+                   out=distances)
+    return indices
+
+
+def leverage_scores(Y: np.ndarray, rank: int) -> np.ndarray:
+    """
+    Leverage scores of the columns of Y of shape (d, n_columns) with respect
+    to its dominant rank-``rank`` right singular subspace
+    """
+    _, _, VT = np.linalg.svd(Y, full_matrices=False)
+    return np.sum(np.square(VT[:rank]), axis=0)
+
+
+def select_landmarks(W: np.ndarray, n_landmarks: int, method="random",
+                     rank=3, seed=0) -> np.ndarray:
+    """
+    Choose the columns of the measurement matrix which are factorized
+    instead of all points. The ``"farthest"`` and ``"leverage"`` methods
+    work on a random sketch of the columns, so their cost is linear in the
+    number of points and independent of the number of views
+
+    Args:
+        W: Measurement matrix of shape (2 * n_views, n_points)
+        n_landmarks: Number of landmarks
+        method: Sampling method. One of
+
+            - ``"random"``: Uniform sampling without replacement
+            - ``"farthest"``: Farthest point sampling, which spreads the
+              landmarks over the point cloud
+            - ``"leverage"``: Sampling proportional to the leverage scores,
+              which prefers points which determine the rank-``rank``
+              subspace
+        rank: Rank of the factorization
+        seed: Seed of the random numbers
+
+    Returns:
+        Sorted indices of the landmarks of shape (n_landmarks,)
+    """
+    if method not in LANDMARK_METHODS:
+        raise ValueError("method must be one of {}, but got '{}'".format(
+            LANDMARK_METHODS, method))
+
+    n_points = W.shape[1]
+    if n_landmarks >= n_points:
+        return np.arange(n_points)
+    if n_landmarks < rank + 1:
+        raise ValueError(
+            "At least {} landmarks are required".format(rank + 1))
+
+    rng = np.random.RandomState(seed)
+    if method == "random":
+        return np.sort(rng.choice(n_points, n_landmarks, replace=False))
+
+    Y = sketch_columns(W, min(W.shape[0], 4 * rank), seed)
+    if method == "farthest":
+        return np.sort(farthest_point_sampling(Y, n_landmarks))
+
+    # mix the uniform distribution so that every point can be chosen
+    scores = leverage_scores(Y, rank)
+    p = 0.5 * scores / np.sum(scores) + 0.5 / n_points
+    return np.sort(rng.choice(n_points, n_landmarks, replace=False, p=p))
+
+
+def solve_points(M: np.ndarray, W: np.ndarray, chunk_size=None):
+    """
+    Solve :math:`\\min_{X}||W - MX||_{F}` for all columns of W at once.
+    The pseudo-inverse of M is computed once and applied to the columns,
+    ``chunk_size`` columns at a time if given, to bound the memory of the
+    temporaries
+
+    Args:
+        M: Motion matrix of shape (2 * n_views, rank)
+        W: Measurement matrix of shape (2 * n_views, n_points)
+        chunk_size: Number of columns solved at once
+
+    Returns:
+        X of shape (rank, n_points)
+    """
+    MT = M.T.astype(np.float64, copy=False)
+    M_pinv = np.linalg.solve(np.dot(MT, MT.T), MT).astype(W.dtype)
+
+    n_points = W.shape[1]
+    if chunk_size is None or chunk_size >= n_points:
+        return np.dot(M_pinv, W)
+
+    X = np.empty((M.shape[1], n_points), dtype=W.dtype)
+    for begin in range(0, n_points, chunk_size):
+        end = begin + chunk_size
+        X[:, begin:end] = np.dot(M_pinv, W[:, begin:end])
+    return X
+
+
+def residual_energy(W: np.ndarray, M: np.ndarray, X: np.ndarray) -> float:
+    """
+    Fraction of :math:`||W||_{F}^{2}` which is not explained by
+    :math:`MX`, where X is the least squares solution of
+    :py:func:`solve_points`. This corresponds to
+    :py:attr:`factorization.Factorization.discarded_energy` of the
+    whole matrix
+
+    Since the columns of :math:`MX` are the projections of those of W onto
+    the column space of M, the explained energy is
+    :math:`||MX||_{F}^{2} = \\mathrm{tr}(M^{\\top}M XX^{\\top})`, which is
+    computed without forming :math:`MX`
+    """
+    total = squared_norm(W)
+    if total == 0:
+        return 0.0
+    MTM = np.dot(M.T, M).astype(np.float64)
+    XXT = np.dot(X, X.T).astype(np.float64)
+    explained = float(np.sum(MTM * XXT))
+    return max(total - explained, 0.0) / total
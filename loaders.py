@@ -0,0 +1,208 @@
+import numpy as np
+
+
+# PLY property types and the corresponding NumPy types
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+PLY_BYTE_ORDERS = {
+    'ascii': None,
+    'binary_little_endian': '<',
+    'binary_big_endian': '>',
+}
+
+
+class PlyElement(object):
+    """
+    Element declared in a PLY header
+
+    Args:
+        name (str): Name of the element
+        count (int): Number of the element instances
+    """
+
+    def __init__(self, name, count):
+        self.name = name
+        self.count = count
+        self.properties = []  # list of (name, type)
+        self.has_list = False
+
+    def dtype(self, byte_order):
+        """Structured dtype of one instance, or None if it has lists"""
+        if self.has_list:
+            return None
+        return np.dtype([(name, byte_order + PLY_TYPES[type_])
+                         for name, type_ in self.properties])
+
+
+def read_ply_header(f):
+    """
+    Parse the header of a PLY file opened in binary mode
+
+    Returns:
+        tuple: (format, elements, header_size) where ``header_size`` is the
+        number of bytes of the header including the ``end_header`` line
+    """
+    if f.readline().strip() != b'ply':
+        raise ValueError("Not a PLY file")
+
+    format_ = None
+    elements = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("The PLY header is not terminated")
+        words = line.decode('ascii').split()
+        if not words or words[0] in ('comment', 'obj_info'):
+            continue
+        if words[0] == 'format':
+            format_ = words[1]
+        elif words[0] == 'element':
+            elements.append(PlyElement(words[1], int(words[2])))
+        elif words[0] == 'property':
+            if words[1] == 'list':
+                elements[-1].has_list = True
+                elements[-1].properties.append((words[4], None))
+            else:
+                elements[-1].properties.append((words[2], words[1]))
+        elif words[0] == 'end_header':
+            break
+
+    if format_ not in PLY_BYTE_ORDERS:
+        raise ValueError("Unknown PLY format '{}'".format(format_))
+    return format_, elements, f.tell()
+
+
+def read_ply_vertices(filename, mmap=True) -> np.ndarray:
+    """
+    Read the x, y and z properties of the vertices in a PLY file
+
+    For binary files whose vertices can be located without parsing, the
+    vertex data is memory-mapped. If x, y and z are consecutive properties
+    of the same type, the returned array is a read-only (n_vertices, 3)
+    view of the file, so no data is copied.
+
+    Args:
+        filename: Path to the PLY file
+        mmap (bool): Memory-map binary vertex data if possible
+
+    Returns:
+        Vertices of shape (n_vertices, 3)
+    """
+    with open(filename, 'rb') as f:
+        format_, elements, header_size = read_ply_header(f)
+
+    names = [element.name for element in elements]
+    if 'vertex' not in names:
+        raise ValueError("The PLY file has no vertex element")
+    index = names.index('vertex')
+    vertex = elements[index]
+    properties = [name for name, _ in vertex.properties]
+
+    if format_ == 'ascii':
+        # each element instance occupies one line
+        skip = sum(element.count for element in elements[:index])
+        columns = [properties.index(axis) for axis in ('x', 'y', 'z')]
+        with open(filename, 'rb') as f:
+            f.seek(header_size)
+            for i in range(skip):
+                f.readline()
+            X = np.loadtxt(f, usecols=columns, max_rows=vertex.count,
+                           ndmin=2)
+        return X
+
+    byte_order = PLY_BYTE_ORDERS[format_]
+    preceding = [element.dtype(byte_order) for element in elements[:index]]
+    vertex_dtype = vertex.dtype(byte_order)
+
+    if vertex_dtype is None or any(d is None for d in preceding):
+        # the offset of the vertices depends on the length of the lists
+        return read_ply_vertices_plyfile(filename)
+
+    offset = header_size + sum(d.itemsize * element.count for d, element
+                               in zip(preceding, elements[:index]))
+
+    if mmap:
+        data = np.memmap(filename, dtype=vertex_dtype, mode='r',
+                         offset=offset, shape=(vertex.count,))
+    else:
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            data = np.fromfile(f, dtype=vertex_dtype, count=vertex.count)
+
+    return xyz_view(data)
+
+
+def xyz_view(vertices: np.ndarray) -> np.ndarray:
+    """
+    Return the x, y and z fields of a structured array as an array of shape
+    (n_vertices, 3). This is a view if the fields are consecutive and
+    of the same type, and a copy otherwise
+    """
+    fields = vertices.dtype.fields
+    types = [fields[axis][0] for axis in ('x', 'y', 'z')]
+    offsets = [fields[axis][1] for axis in ('x', 'y', 'z')]
+
+    itemsize = types[0].itemsize
+    consecutive = (types[0] == types[1] == types[2] and
+                   offsets[1] == offsets[0] + itemsize and
+                   offsets[2] == offsets[1] + itemsize)
+
+    if not consecutive:
+        return np.column_stack([vertices[axis] for axis in ('x', 'y', 'z')])
+
+    return np.ndarray(
+        shape=(vertices.shape[0], 3),
+        dtype=types[0],
+        buffer=vertices,
+        offset=offsets[0],
+        strides=(vertices.dtype.itemsize, itemsize)
+    )
+
+
+def read_ply_vertices_plyfile(filename) -> np.ndarray:
+    """Read the vertices with plyfile, which parses the whole file"""
+    from plyfile import PlyData
+
+    vertex = PlyData.read(filename)['vertex']
+    return np.column_stack([vertex[axis] for axis in ('x', 'y', 'z')])
+
+
+def save_measurement_matrix(filename, W: np.ndarray):
+    """Save a measurement matrix to a ``.npy`` file"""
+    np.save(filename, W)
+
+
+def load_measurement_matrix(filename, mmap=True) -> np.ndarray:
+    """
+    Load a measurement matrix saved by :py:func:`save_measurement_matrix`.
+    The file is memory-mapped read-only if ``mmap`` is True
+    """
+    return np.load(filename, mmap_mode='r' if mmap else None)
+
+
+def save_reconstruction(filename, M: np.ndarray, X: np.ndarray):
+    """
+    Save the motion matrix M and the reconstructed points X to an
+    ``.npz`` file
+    """
+    np.savez(filename, M=M, X=X)
+
+
+def load_reconstruction(filename):
+    """
+    Load a reconstruction saved by :py:func:`save_reconstruction`
+
+    Returns:
+        tuple: (M, X)
+    """
+    with np.load(filename) as data:
+        return data['M'], data['X']
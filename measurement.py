@@ -0,0 +1,101 @@
+import numpy as np
+
+
+class MeasurementBuffer(object):
+    """
+    Growable contiguous buffer of rows which forms a measurement matrix.
+    The capacity is doubled when the buffer is full so that appending rows
+    costs amortized constant time per row.
+
+    Args:
+        dtype: Data type of the buffer
+        initial_capacity (int): Number of rows allocated at the first append
+    """
+
+    def __init__(self, dtype=np.float64, initial_capacity=16):
+        self.dtype = np.dtype(dtype)
+        self.initial_capacity = initial_capacity
+
+        self._buffer = None
+        self._n_rows = 0
+
+    def __len__(self):
+        return self._n_rows
+
+    @property
+    def n_columns(self):
+        """The number of columns, or None if nothing has been added"""
+        if self._buffer is None:
+            return None
+        return self._buffer.shape[1]
+
+    @property
+    def capacity(self):
+        """The number of rows which can be stored without reallocation"""
+        if self._buffer is None:
+            return 0
+        return self._buffer.shape[0]
+
+    @property
+    def data(self) -> np.ndarray:
+        """
+        View of the rows added so far. The view is not copied, and it
+        stays valid after further rows are appended
+        """
+        if self._buffer is None:
+            return np.empty((0, 0), dtype=self.dtype)
+        return self._buffer[:self._n_rows]
+
+    def reserve(self, n_rows: int, n_columns: int):
+        """
+        Make sure that at least ``n_rows`` rows in total can be stored
+        without reallocation
+        """
+        if self._buffer is None:
+            capacity = max(n_rows, self.initial_capacity)
+            self._buffer = np.empty((capacity, n_columns), dtype=self.dtype)
+            return
+
+        if n_columns != self.n_columns:
+            raise ValueError(
+                "Expected {} columns but got {}".format(
+                    self.n_columns, n_columns)
+            )
+
+        if n_rows <= self.capacity:
+            return
+
+        capacity = max(n_rows, 2 * self.capacity)
+        buffer = np.empty((capacity, n_columns), dtype=self.dtype)
+        buffer[:self._n_rows] = self._buffer[:self._n_rows]
+        self._buffer = buffer
+
+    def allocate(self, n_rows: int, n_columns: int) -> np.ndarray:
+        """
+        Append ``n_rows`` uninitialized rows and return a writable view of
+        them, so that the caller can fill the rows in place
+        """
+        self.reserve(self._n_rows + n_rows, n_columns)
+        begin = self._n_rows
+        self._n_rows += n_rows
+        return self._buffer[begin:self._n_rows]
+
+    def append(self, rows: np.ndarray):
+        """
+        Append rows of shape (n_rows, n_columns)
+        """
+        self.allocate(*rows.shape)[:] = rows
+
+    def copy(self):
+        """
+        Buffer which holds a copy of the rows added so far, so that it is
+        not affected by later changes of this buffer
+        """
+        buffer = MeasurementBuffer(self.dtype, self.initial_capacity)
+        if self._buffer is not None:
+            buffer.append(self.data)
+        return buffer
+
+    def clear(self):
+        """Remove all rows while keeping the allocated memory"""
+        self._n_rows = 0
@@ -0,0 +1,294 @@
+import numpy as np
+
+
+def symmetric_coefficients(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Coefficients of the bilinear forms :math:`\\mathbf{a}^{\\top}L\\mathbf{b}`
+    with respect to the 6 unique entries
+    :math:`(L_{00}, L_{01}, L_{02}, L_{11}, L_{12}, L_{22})`
+    of a symmetric matrix L
+
+    Args:
+        A: Row vectors of shape (n, 3)
+        B: Row vectors of shape (n, 3)
+
+    Returns:
+        Coefficient matrix of shape (n, 6)
+    """
+    return np.column_stack((
+        A[:, 0] * B[:, 0],
+        A[:, 0] * B[:, 1] + A[:, 1] * B[:, 0],
+        A[:, 0] * B[:, 2] + A[:, 2] * B[:, 0],
+        A[:, 1] * B[:, 1],
+        A[:, 1] * B[:, 2] + A[:, 2] * B[:, 1],
+        A[:, 2] * B[:, 2],
+    ))
+
+
+def solve_metric_gram(M: np.ndarray) -> np.ndarray:
+    """
+    Find the symmetric matrix :math:`L = QQ^{\\top}` which satisfies the
+    orthonormality constraints of all views in the least squares sense
+
+    .. math::
+        \\mathbf{a}_{f}^{\\top}L\\mathbf{a}_{f} = 1, \\,
+        \\mathbf{b}_{f}^{\\top}L\\mathbf{b}_{f} = 1, \\,
+        \\mathbf{a}_{f}^{\\top}L\\mathbf{b}_{f} = 0
+
+    where :math:`\\mathbf{a}_{f}` and :math:`\\mathbf{b}_{f}` are the rows of
+    the motion matrix corresponding to the :math:`f`-th view
+
+    Args:
+        M: Stacked motion matrix of shape (2 * n_views, 3)
+    """
+    A, B = M[0::2], M[1::2]
+    F = A.shape[0]
+
+    D = np.vstack((
+        symmetric_coefficients(A, A),
+        symmetric_coefficients(B, B),
+        symmetric_coefficients(A, B)
+    ))
+    c = np.concatenate((np.ones(2 * F), np.zeros(F)))
+
+    l = np.linalg.lstsq(D, c, rcond=None)[0]
+    return np.array([
+        [l[0], l[1], l[2]],
+        [l[1], l[3], l[4]],
+        [l[2], l[4], l[5]]
+    ])
+
+
+def factor_gram(L: np.ndarray) -> np.ndarray:
+    """
+    Find Q such that :math:`QQ^{\\top} = L`.
+    If L is not positive definite because of noise, the closest
+    positive semidefinite matrix is factorized instead
+    """
+    try:
+        return np.linalg.cholesky(L)
+    except np.linalg.LinAlgError:
+        w, V = np.linalg.eigh(L)
+        w = np.clip(w, np.finfo(L.dtype).eps * max(w.max(), 1.0), None)
+        return V * np.sqrt(w)
+
+
+def metric_residuals(M: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """
+    Residuals of the orthonormality constraints of :math:`MQ`.
+    The off-diagonal residuals are scaled by :math:`\\sqrt{2}` so that the
+    sum of squares equals
+    :math:`\\sum_{f} ||\\hat{M}_{f}\\hat{M}_{f}^{\\top} - I||^{2}_{F}`
+    """
+    P = np.dot(M, Q)
+    A, B = P[0::2], P[1::2]
+    return np.concatenate((
+        np.einsum('ij,ij->i', A, A) - 1,
+        np.einsum('ij,ij->i', B, B) - 1,
+        np.sqrt(2) * np.einsum('ij,ij->i', A, B)
+    ))
+
+
+def metric_jacobian(M: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """
+    Jacobian of :py:func:`metric_residuals` with respect to the entries of Q
+
+    Returns:
+        Jacobian of shape (3 * n_views, 9)
+    """
+    P = np.dot(M, Q)
+    A, B = M[0::2], M[1::2]
+    PA, PB = P[0::2], P[1::2]
+
+    # d(a^T Q Q^T b) / dQ = a (Q^T b)^T + b (Q^T a)^T
+    def d(a, b, pa, pb):
+        J = np.einsum('ni,nj->nij', a, pb) + np.einsum('ni,nj->nij', b, pa)
+        return J.reshape(-1, 9)
+
+    return np.vstack((
+        d(A, A, PA, PA),
+        d(B, B, PB, PB),
+        np.sqrt(2) * d(A, B, PA, PB)
+    ))
+
+
+def gauss_newton(M: np.ndarray, Q: np.ndarray, max_iter=10, tol=1e-12):
+    """
+    Refine Q by Gauss-Newton iterations over all views at once
+
+    Returns:
+        tuple: (Q, n_iter) where ``n_iter`` is the number of iterations
+    """
+    loss = np.sum(np.square(metric_residuals(M, Q)))
+    for i in range(max_iter):
+        r = metric_residuals(M, Q)
+        J = metric_jacobian(M, Q)
+        # J has a 3-dimensional null space since Q and QR give the same
+        # residuals for any rotation R. lstsq returns the minimum norm step
+        dq = np.linalg.lstsq(J, -r, rcond=None)[0]
+        Q_new = Q + dq.reshape(3, 3)
+        loss_new = np.sum(np.square(metric_residuals(M, Q_new)))
+        if loss_new > loss:
+            return Q, i
+        Q = Q_new
+        if loss - loss_new <= tol * max(loss, 1.0):
+            return Q, i + 1
+        loss = loss_new
+    return Q, max_iter
+
+
+def levenberg_marquardt(M: np.ndarray, Q: np.ndarray, max_iter=100,
+                        tol=1e-12, damping=1e-3):
+    """
+    Minimize :math:`\\sum_{f} ||M_{f}QQ^{\\top}M_{f}^{\\top} - I||^{2}_{F}`
+    over the 9 entries of Q by the Levenberg-Marquardt method.
+    The residuals and the analytic Jacobian are evaluated over all views at
+    once, and the Gauss-Newton approximation :math:`J^{\\top}J` of the
+    Hessian is only 9 x 9 regardless of the number of views.
+
+    Args:
+        M: Stacked motion matrix of shape (2 * n_views, 3)
+        Q: Initial value of Q
+        max_iter: Maximum number of iterations
+        tol: The iteration stops when the relative decrease of the loss or
+            the norm of the gradient is smaller than this value
+        damping: Initial damping factor
+
+    Returns:
+        tuple: (Q, n_iter, loss) where ``loss`` is the final sum of squares
+    """
+    r = metric_residuals(M, Q)
+    loss = np.dot(r, r)
+
+    for i in range(max_iter):
+        J = metric_jacobian(M, Q)
+        H = np.dot(J.T, J)
+        g = np.dot(J.T, r)
+
+        if np.linalg.norm(g) <= tol:
+            return Q, i, loss
+
+        # increase the damping until the loss decreases
+        while True:
+            # the damping also fixes the rotational gauge freedom of Q
+            # which makes H singular
+            dq = np.linalg.solve(H + damping * np.eye(9), -g)
+            Q_new = Q + dq.reshape(3, 3)
+            r_new = metric_residuals(M, Q_new)
+            loss_new = np.dot(r_new, r_new)
+            if loss_new < loss:
+                damping = max(damping / 10, 1e-12)
+                break
+            damping *= 10
+            if damping > 1e12:
+                return Q, i, loss
+
+        converged = loss - loss_new <= tol * loss
+        Q, r, loss = Q_new, r_new, loss_new
+        if converged:
+            return Q, i + 1, loss
+
+    return Q, max_iter, loss
+
+
+class LinearAffineCorrection(object):
+    """
+    Closed-form metric upgrade.
+    The orthonormality constraints on :math:`L = QQ^{\\top}` are solved
+    as one linear least squares problem over all views, and Q is obtained
+    by factorizing L. Q can be optionally refined by Gauss-Newton iterations.
+
+    This class provides the same interface as
+    :py:class:`affine_correction.AffineCorrection` but depends only on NumPy.
+
+    Args:
+        X_eval (np.ndarray): Matrix of the shape as the 3D point cloud, used to
+            evaluate the reconstruction quality
+        refine (bool): Refine Q by Gauss-Newton iterations if True
+        max_iter (int): Maximum number of Gauss-Newton iterations
+    """
+
+    def __init__(self, X_eval=None, refine=True, max_iter=10):
+        self.X_eval = X_eval
+        self.refine = refine
+        self.max_iter = max_iter
+
+        self.Q = np.eye(3)
+        self.loss = None
+
+    def optimize(self, M: np.ndarray, X: np.ndarray):
+        """
+        Find the affine transformation Q which makes the rows of
+        :math:`MQ` orthonormal
+
+        Args:
+            M: Stacked motion matrix of shape (2 * n_views, 3)
+            X: 3D point cloud of shape (n_points, 3)
+        """
+        M = M.astype(np.float64, copy=False)
+
+        Q = factor_gram(solve_metric_gram(M))
+        if self.refine:
+            Q, _ = gauss_newton(M, Q, self.max_iter)
+
+        F = M.shape[0] // 2
+        self.loss = np.sum(np.square(metric_residuals(M, Q))) / F
+        self.Q = Q
+
+    def transform_m(self, M, Q):
+        return np.dot(M, Q).astype(M.dtype, copy=False)
+
+    def transform_x(self, X, Q):
+        X_ = np.dot(np.linalg.inv(Q), X.T)
+        return X_.T.astype(X.dtype, copy=False)
+
+    def __call__(self, M, X):
+        """
+        Calculate :math:`MQ` and :math:`Q^{-1}X^{\\top}`
+        """
+        return self.transform_m(M, self.Q), self.transform_x(X, self.Q)
+
+
+class SecondOrderAffineCorrection(LinearAffineCorrection):
+    """
+    Affine correction which minimizes the loss defined in
+    :py:meth:`affine_correction.AffineTransformation.get_loss_func`
+    over all views at once by :py:func:`levenberg_marquardt`.
+    Unlike the SGD solver, which draws the initial Q at random with
+    Chainer's default initializer, the iteration starts from the identity
+    so that the result is deterministic. The identity is a reasonable start
+    since the factors are normalized so that the rows of M have a unit
+    norm on average.
+
+    After :py:meth:`optimize`, ``n_iter`` and ``loss`` hold the number of
+    iterations and the final loss.
+
+    Args:
+        X_eval (np.ndarray): Matrix of the shape as the 3D point cloud, used to
+            evaluate the reconstruction quality
+        max_iter (int): Maximum number of iterations
+        tol (float): Tolerance of the stopping rule
+    """
+
+    def __init__(self, X_eval=None, max_iter=100, tol=1e-12):
+        super(SecondOrderAffineCorrection, self).__init__(X_eval)
+        self.max_iter = max_iter
+        self.tol = tol
+        self.n_iter = None
+
+    def optimize(self, M: np.ndarray, X: np.ndarray):
+        """
+        Find Q which minimizes the loss
+
+        Args:
+            M: Stacked motion matrix of shape (2 * n_views, 3)
+            X: 3D point cloud of shape (n_points, 3)
+        """
+        M = M.astype(np.float64, copy=False)
+
+        Q, self.n_iter, loss = levenberg_marquardt(
+            M, np.eye(3), self.max_iter, self.tol)
+
+        F = M.shape[0] // 2
+        self.loss = loss / F
+        self.Q = Q
@@ -0,0 +1,107 @@
+import numpy as np
+
+from factorization import factorize
+
+
+def accumulate(indices: np.ndarray, n: int, A: np.ndarray) -> np.ndarray:
+    """
+    Sum the arrays ``A[k]`` which share the same index ``indices[k]``
+
+    Args:
+        indices: Indices of shape (n_observations,)
+        n: Number of distinct indices
+        A: Arrays of shape (n_observations, ...)
+
+    Returns:
+        Sums of shape (n, ...)
+    """
+    shape = A.shape[1:]
+    A = A.reshape(A.shape[0], -1)
+    d = A.shape[1]
+    flat_indices = indices[:, np.newaxis] * d + np.arange(d)
+    sums = np.bincount(flat_indices.ravel(), weights=A.ravel(),
+                       minlength=n * d)
+    return sums.reshape((n,) + shape)
+
+
+def solve_normal_equations(indices, n, A, b, damping):
+    """
+    Solve :math:`(\\sum_{k} \\mathbf{a}_{k}\\mathbf{a}_{k}^{\\top} +
+    \\lambda I)\\mathbf{x} = \\sum_{k} b_{k}\\mathbf{a}_{k}`
+    for each index at once
+    """
+    d = A.shape[1]
+    H = accumulate(indices, n, np.einsum('ki,kj->kij', A, A))
+    g = accumulate(indices, n, A * b[:, np.newaxis])
+    H += damping * np.eye(d)
+    return np.linalg.solve(H, g[..., np.newaxis])[..., 0]
+
+
+def factorize_missing(W: np.ndarray, mask: np.ndarray, rank=3,
+                      max_iter=100, tol=1e-9, damping=1e-9):
+    """
+    Factorize a partially observed matrix as
+    :math:`W_{ij} \\approx \\mathbf{m}_{i}^{\\top}\\mathbf{x}_{j} + t_{i}`
+    by alternating least squares over the observed entries only.
+
+    The offsets :math:`t_{i}` absorb the bias of row means which were
+    calculated from different subsets of the columns. Each iteration costs
+    time proportional to the number of observed entries.
+
+    Args:
+        W: Matrix of shape (n_rows, n_columns). Unobserved entries are ignored
+        mask: Boolean array of the same shape as W which is True
+            where the entry is observed
+        rank: Rank of the factorization
+        max_iter: Maximum number of iterations
+        tol: The iteration stops when the relative decrease of the
+            residual is smaller than this value
+        damping: Tikhonov regularization added to the normal equations of
+            rows and columns with few observations
+
+    Returns:
+        tuple: (M, X, t, n_iter) where
+
+            - M: Matrix of shape (n_rows, rank)
+            - X: Matrix of shape (n_columns, rank) with zero mean
+            - t: Offsets of shape (n_rows,)
+            - n_iter: Number of iterations
+    """
+    n_rows, n_columns = W.shape
+    rows, columns = np.nonzero(mask)
+    w = W[rows, columns]
+
+    # initialize by the factorization of W whose unobserved entries are 0
+    U, s, VT, _ = factorize(np.where(mask, W, 0), rank)
+    M = U * s
+    X = VT.T
+    t = np.zeros(n_rows)
+
+    def residual(M, X, t):
+        r = w - np.einsum('ki,ki->k', M[rows], X[columns]) - t[rows]
+        return np.sqrt(np.mean(np.square(r)))
+
+    error = residual(M, X, t)
+    n_iter = max_iter
+    for i in range(max_iter):
+        X = solve_normal_equations(columns, n_columns, M[rows],
+                                   w - t[rows], damping)
+
+        # augment x with 1 to estimate the offsets together with M
+        A = np.hstack((X[columns], np.ones((len(columns), 1))))
+        Mt = solve_normal_equations(rows, n_rows, A, w, damping)
+        M, t = Mt[:, :rank], Mt[:, rank]
+
+        error_new = residual(M, X, t)
+        converged = error - error_new <= tol * max(error, 1e-300)
+        error = error_new
+        if converged:
+            n_iter = i + 1
+            break
+
+    # move the centroid of X to the origin
+    mean = np.mean(X, axis=0)
+    X = X - mean
+    t = t + np.dot(M, mean)
+
+    return M, X, t, n_iter
@@ -0,0 +1,247 @@
+import numpy as np
+
+from measurement import MeasurementBuffer
+from metric_upgrade import LinearAffineCorrection
+
+
+# Views with weights smaller than this are not used in the metric upgrade
+MIN_VIEW_WEIGHT = 1e-3
+
+
+class IncrementalSVD(object):
+    """
+    Track the rank-``rank`` truncated SVD :math:`W \\approx USV^{\\top}`
+    of a matrix whose rows arrive sequentially.
+    See :cite:`brand2002incremental` for the detailed method.
+
+    The left singular vectors are kept in the factored form
+    :math:`U = DU_{0}R` where the rows of :math:`U_{0}` are appended once
+    and never modified, and only the small matrix :math:`R` of shape
+    (rank, rank) is rotated by each update. The scale of R is kept apart
+    in the logarithmic domain, and D is the diagonal matrix of the scales of
+    the rows relative to it, so that the forgetting factor, which shrinks
+    R at every update, does not overflow :math:`U_{0}` or underflow R.
+    Adding a block of rows to a matrix with ``n_columns`` columns therefore
+    costs :math:`O(n_{columns}r^{2})` regardless of the number of rows
+    added so far
+
+    Args:
+        rank (int): Rank of the tracked subspace
+        forgetting_factor (float): Factor in (0, 1] multiplied to the
+            singular values before each update so that old rows are
+            gradually down-weighted
+        reorthogonalization_interval (int): The subspaces are
+            reorthonormalized every this number of updates to cancel the
+            accumulated rounding error
+    """
+
+    # R is multiplied out into the rows when its condition number
+    # exceeds this value
+    MAX_ROTATION_CONDITION = 1e6
+
+    def __init__(self, rank=3, forgetting_factor=1.0,
+                 reorthogonalization_interval=100):
+        if not 0 < forgetting_factor <= 1:
+            raise ValueError("forgetting_factor must be in (0, 1]")
+
+        self.rank = rank
+        self.forgetting_factor = forgetting_factor
+        self.reorthogonalization_interval = reorthogonalization_interval
+
+        self.rows = MeasurementBuffer()  # U_0
+        # logarithms of the scales of the rows of U_0 and of R
+        self.row_log_scales = MeasurementBuffer()
+        self.log_scale = 0.0
+        self.rotation = None  # R normalized to a unit scale
+        self.rotation_inv = None  # R^{-1}
+        self.gram = None  # (D U_0)^T (D U_0)
+        self.s = None
+        self.V = None
+        self.n_updates = 0
+
+    def __len__(self):
+        """The number of rows added so far"""
+        return len(self.rows)
+
+    @property
+    def U(self) -> np.ndarray:
+        """
+        Left singular vectors of shape (n_rows, rank).
+        This multiplies out the factored form and costs
+        :math:`O(n_{rows}r^{2})`
+        """
+        return self.scaled_U()
+
+    def scaled_U(self, log_weights: np.ndarray = None) -> np.ndarray:
+        """
+        Left singular vectors whose rows are divided by
+        ``np.exp(log_weights)``. The scales are combined in the logarithmic
+        domain, so rows with tiny weights do not become 0 / 0
+        """
+        log_scales = self.log_scale - self.row_log_scales.data[:, 0]
+        if log_weights is not None:
+            log_scales = log_scales - log_weights
+        with np.errstate(over='ignore'):
+            scales = np.exp(log_scales)
+        return np.dot(self.rows.data * scales[:, np.newaxis], self.rotation)
+
+    def reset_rows(self, U: np.ndarray):
+        """Replace the factored form with :math:`U_{0} = U, D = R = I`"""
+        r = U.shape[1]
+        self.rows = MeasurementBuffer()
+        self.rows.append(U)
+        self.row_log_scales = MeasurementBuffer()
+        self.row_log_scales.append(np.zeros((U.shape[0], 1)))
+        self.log_scale = 0.0
+        self.rotation = np.eye(r)
+        self.rotation_inv = np.eye(r)
+        self.gram = np.dot(U.T, U)
+
+    def normalize_rotation(self):
+        """Move the scale of R into ``log_scale``"""
+        f = np.linalg.norm(self.rotation) / np.sqrt(self.rotation.shape[0])
+        self.rotation = self.rotation / f
+        self.rotation_inv = self.rotation_inv * f
+        self.log_scale += np.log(f)
+        self.gram *= f * f
+
+    def update(self, C: np.ndarray):
+        """
+        Add rows C of shape (n_rows, n_columns)
+        """
+        if self.V is None:
+            U, s, VT = np.linalg.svd(C, full_matrices=False)
+            r = min(self.rank, s.shape[0])
+            self.reset_rows(U[:, :r])
+            self.s, self.V = s[:r], VT[:r].T
+            self.n_updates = 1
+            return
+
+        s, V = self.forgetting_factor * self.s, self.V
+        r = s.shape[0]
+        k = C.shape[0]
+
+        # decompose C into the components inside and outside of span(V)
+        P = np.dot(C, V)
+        J, K = np.linalg.qr((C - np.dot(P, V.T)).T)
+
+        # [W; C] = blockdiag(U, I) [[S, 0], [P, K^T]] [V, J]^T
+        core = np.zeros((r + k, r + k))
+        core[:r, :r] = np.diag(s)
+        core[r:, :r] = P
+        core[r:, r:] = K.T
+
+        Uc, sc, VcT = np.linalg.svd(core)
+        r_new = min(self.rank, r + k)
+
+        self.V = np.dot(V, VcT[:r_new, :r].T) + np.dot(J, VcT[:r_new, r:].T)
+        self.s = sc[:r_new]
+
+        # [U; C] -> [U A; B]
+        A = Uc[:r, :r_new]
+        B = Uc[r:, :r_new]
+        if r_new == r and np.linalg.cond(A) < self.MAX_ROTATION_CONDITION:
+            # D U_0 R A = D U_0 R', so the new rows are stored as B R'^{-1}
+            self.rotation = np.dot(self.rotation, A)
+            self.rotation_inv = np.dot(np.linalg.inv(A), self.rotation_inv)
+            self.normalize_rotation()
+            B = np.dot(B, self.rotation_inv)
+            self.rows.append(B)
+            self.row_log_scales.append(np.full((k, 1), self.log_scale))
+            self.gram += np.dot(B.T, B)
+        else:
+            # the rank grows until it reaches self.rank
+            self.reset_rows(np.vstack((np.dot(self.U, A), B)))
+
+        self.n_updates += 1
+        if self.n_updates % self.reorthogonalization_interval == 0:
+            self.reorthogonalize()
+
+    def reorthogonalize(self):
+        """
+        Reorthonormalize U and V while keeping :math:`USV^{\\top}`.
+        The Gram matrix of U is obtained from that of :math:`DU_{0}`,
+        so only R is modified
+        """
+        G = np.dot(self.rotation.T, np.dot(self.gram, self.rotation))
+        Ru = np.linalg.cholesky(G).T  # U = Q Ru where Q is orthonormal
+        Qv, Rv = np.linalg.qr(self.V)
+        Uc, s, VcT = np.linalg.svd(np.dot(Ru * self.s, Rv.T))
+
+        # U <- Q Uc = D U_0 R Ru^{-1} Uc
+        self.rotation = np.dot(self.rotation, np.linalg.solve(Ru, Uc))
+        self.rotation_inv = np.dot(Uc.T, np.dot(Ru, self.rotation_inv))
+        self.normalize_rotation()
+        self.s = s
+        self.V = np.dot(Qv, VcT.T)
+
+        if np.linalg.cond(self.rotation) > self.MAX_ROTATION_CONDITION:
+            self.reset_rows(self.U)
+
+
+class OnlineTomasiKanade(object):
+    """
+    Online variant of :py:class:`tomasi_kanade.TomasiKanade`.
+    The rank-3 subspace of the measurement matrix is updated every time a
+    view is added, so that the reconstruction can be obtained at any time
+    without refactorizing the whole measurement matrix.
+
+    Args:
+        forgetting_factor (float): Weight in (0, 1] multiplied to the past
+            views every time a new view arrives. 1 means no forgetting
+    """
+
+    def __init__(self, forgetting_factor=1.0):
+        self.svd = IncrementalSVD(3, forgetting_factor)
+        self.affine_correction = LinearAffineCorrection()
+
+    @property
+    def n_views(self):
+        """The number of views added so far"""
+        return len(self.svd) // 2
+
+    def add_image_points(self, image_points: np.ndarray):
+        """
+        Add 2D image points and update the motion and shape subspaces
+
+        Args:
+            image_points: Image points of shape (n_points, 2)
+        """
+
+        mean = np.mean(image_points, axis=0, keepdims=True)
+        self.svd.update((image_points - mean).T)
+
+    def current_estimate(self):
+        """
+        Reconstruct from the views added so far
+
+        Returns:
+            tuple: containing 2 elements:
+
+                - M: Motion matrix of shape (2m, 3) where `m` is
+                  the number of viewpoints
+                - X: Reconstructed 3D points of shape (n, 3) where `n` is
+                  the number of points in the reconstructed point cloud
+        """
+        svd = self.svd
+        if svd.s is None or svd.s.shape[0] < 3:
+            raise ValueError("At least 2 views are required")
+
+        # the rows of U S are down-weighted by forgetting_factor ** age.
+        # The weights are removed in the logarithmic domain since they
+        # underflow on long sequences
+        ages = np.repeat(np.arange(self.n_views)[::-1], 2)
+        log_weights = ages * np.log(svd.forgetting_factor)
+        M = svd.scaled_U(log_weights) * svd.s
+        X = svd.V
+
+        # views which are almost forgotten are excluded from the metric
+        # constraints since their motion is dominated by rounding error
+        recent = log_weights >= np.log(MIN_VIEW_WEIGHT)
+
+        k = np.linalg.norm(M[recent], axis=1).mean()
+        M = M / k
+        X = X * k
+
+        self.affine_correction.optimize(M[recent], X)
+        return self.affine_correction(M, X)
@@ -0,0 +1,124 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def load_block(block) -> np.ndarray:
+    """
+    Return a column block of the measurement matrix.
+    If ``block`` is a path to a ``.npy`` file, the file is memory-mapped
+    instead of being read into memory
+    """
+    if isinstance(block, (str, os.PathLike)):
+        return np.load(block, mmap_mode='r')
+    return np.asarray(block)
+
+
+def block_statistics(block):
+    """
+    Calculate :math:`W_{b}W_{b}^{\\top}`, the row sums and the number of
+    columns of a column block :math:`W_{b}`
+    """
+    # the products are calculated in double precision since the centering
+    # of the Gram matrix cancels large terms. This costs the memory of one
+    # block in double precision
+    W = load_block(block).astype(np.float64, copy=False)
+    return np.dot(W, W.T), np.sum(W, axis=1), W.shape[1]
+
+
+def map_blocks(function, blocks, workers):
+    """
+    Apply ``function`` to each block in order.
+    The blocks are processed by ``workers`` threads since NumPy releases the
+    GIL during the matrix products
+    """
+    if workers == 1:
+        return map(function, blocks)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    # the executor is shut down when the generator is exhausted
+    return _map_with_executor(executor, function, blocks)
+
+
+def _map_with_executor(executor, function, blocks):
+    with executor:
+        yield from executor.map(function, blocks)
+
+
+def factorize_blocks(blocks, rank=3, workers=1):
+    """
+    Calculate the rank-``rank`` left singular subspace of a measurement matrix
+    :math:`W = [W_{1}, \\dots, W_{B}]` split into column blocks.
+
+    Only :math:`WW^{\\top}` of shape (2 * n_views, 2 * n_views) and one block
+    per worker are kept in memory. The rows are centered by the means over
+    all points, so the blocks do not need to be centered beforehand.
+
+    Args:
+        blocks: Sequence of column blocks of shape (2 * n_views, n_b),
+            given as arrays or paths to ``.npy`` files
+        rank: Rank of the factorization
+        workers: Number of threads which process the blocks
+
+    Returns:
+        tuple: (U, s, mean, discarded_energy) where
+
+            - U: Left singular vectors of shape (2 * n_views, rank)
+            - s: Singular values of shape (rank,)
+            - mean: Row means of shape (2 * n_views,)
+            - discarded_energy: See :py:class:`factorization.Factorization`
+    """
+    G, row_sums, n_points = None, None, 0
+    for G_b, row_sums_b, n_b in map_blocks(block_statistics, blocks, workers):
+        if G is None:
+            G, row_sums = G_b, row_sums_b
+        else:
+            G += G_b
+            row_sums += row_sums_b
+        n_points += n_b
+
+    if G is None:
+        raise ValueError("At least one block is required")
+
+    # Gram matrix of the centered measurement matrix
+    mean = row_sums / n_points
+    G -= n_points * np.outer(mean, mean)
+
+    eigenvalues, eigenvectors = np.linalg.eigh(G)
+    eigenvalues = np.clip(eigenvalues[::-1], 0, None)
+    U = eigenvectors[:, ::-1][:, :rank]
+    s = np.sqrt(eigenvalues[:rank])
+
+    total = np.sum(eigenvalues)
+    discarded_energy = 0.0 if total == 0 else \
+        float(np.sum(eigenvalues[rank:]) / total)
+    return U, s, mean, discarded_energy
+
+
+def recover_points(blocks, U, s, mean, workers=1):
+    """
+    Project each centered block onto the left singular subspace to recover
+    :math:`V_{b}^{\\top} = S^{-1}U^{\\top}(W_{b} - \\bar{\\mathbf{w}}
+    \\mathbf{1}^{\\top})`
+
+    Args:
+        blocks: The same blocks as passed to :py:func:`factorize_blocks`
+        U: Left singular vectors of shape (2 * n_views, rank)
+        s: Singular values of shape (rank,)
+        mean: Row means of shape (2 * n_views,)
+        workers: Number of threads which process the blocks
+
+    Yields:
+        Right singular vectors of each block of shape (rank, n_b)
+    """
+    UT = U.T / np.where(s > 0, s, 1)[:, np.newaxis]
+    mean = mean[:, np.newaxis]
+
+    def recover(block):
+        W = load_block(block)
+        # the block is centered in double precision before the projection,
+        # so that the large uncentered terms do not cancel after it
+        Wc = W.astype(np.float64, copy=False) - mean
+        return np.dot(UT, Wc).astype(W.dtype, copy=False)
+
+    yield from map_blocks(recover, blocks, workers)
@@ -0,0 +1,246 @@
+import numpy as np
+
+from factorization import factorize, squared_norm
+from measurement import MeasurementBuffer
+
+
+def normalization_transforms(image_points: np.ndarray) -> np.ndarray:
+    """
+    Similarity transforms which move the centroid of the points in each view
+    to the origin and scale their mean distance from it to :math:`\\sqrt{2}`
+
+    Args:
+        image_points: Image points of shape (n_views, n_points, 2)
+
+    Returns:
+        Transforms of shape (n_views, 3, 3)
+    """
+    n_views = image_points.shape[0]
+    mean = image_points.mean(axis=1)
+    distance = np.linalg.norm(image_points - mean[:, np.newaxis], axis=2)
+    distance = distance.mean(axis=1)
+    scale = np.sqrt(2) / np.where(distance > 0, distance, 1)
+
+    T = np.zeros((n_views, 3, 3))
+    T[:, 0, 0] = T[:, 1, 1] = scale
+    T[:, 0:2, 2] = -scale[:, np.newaxis] * mean
+    T[:, 2, 2] = 1
+    return T
+
+
+def normalize_points(image_points: np.ndarray):
+    """
+    Convert image points to normalized homogeneous coordinates
+
+    Args:
+        image_points: Image points of shape (n_views, n_points, 2)
+
+    Returns:
+        tuple: (q, T) where ``q`` is of shape (n_views, 3, n_points) and
+        ``T`` is of shape (n_views, 3, 3)
+    """
+    T = normalization_transforms(image_points)
+    # the third coordinates of the normalized points are 1
+    q = np.ones((image_points.shape[0], 3, image_points.shape[1]))
+    q[:, 0:2] = (np.matmul(T[:, 0:2, 0:2], image_points.transpose(0, 2, 1)) +
+                 T[:, 0:2, 2:3])
+    return q, T
+
+
+def balance_depths(depths: np.ndarray, q: np.ndarray,
+                   n_iter: int = 2) -> np.ndarray:
+    """
+    Rescale the projective depths so that each column and each triplet of
+    rows of the rescaled measurement matrix has a unit norm on average.
+    This prevents the trivial solution in which the depths shrink to 0
+
+    Args:
+        depths: Projective depths of shape (n_views, n_points)
+        q: Normalized homogeneous points of shape (n_views, 3, n_points)
+        n_iter: Number of alternations between rows and columns
+    """
+    n_views, n_points = depths.shape
+    q_norms = np.square(q).sum(axis=1)
+    for i in range(n_iter):
+        # squared norms of the blocks of the rescaled measurement matrix
+        E = np.square(depths) * q_norms
+        depths = depths * np.sqrt(n_views / E.sum(axis=0))
+        E = np.square(depths) * q_norms
+        depths = depths * np.sqrt(n_points / E.sum(axis=1))[:, np.newaxis]
+    return depths
+
+
+def subspace_iteration(W: np.ndarray, U: np.ndarray, n_iter: int = 1):
+    """
+    Refine the orthonormal basis U of the dominant left singular subspace
+    of W, starting from the basis of a nearby matrix
+
+    Args:
+        W: Matrix of shape (n_rows, n_columns)
+        U: Orthonormal basis of shape (n_rows, rank)
+        n_iter: Number of iterations
+
+    Returns:
+        Refined basis of shape (n_rows, rank)
+    """
+    for i in range(n_iter):
+        U, _ = np.linalg.qr(np.dot(W, np.dot(W.T, U)))
+    return U
+
+
+def projective_factorization(image_points: np.ndarray, method="economy",
+                             max_iter=100, tol=1e-10, n_subspace_iter=1):
+    """
+    Recover the projection matrices and the homogeneous 3D points from
+    image points observed by perspective cameras.
+    See :cite:`sturm1996factorization` and :cite:`oliensis2007iterative`.
+
+    The rescaled measurement matrix
+    :math:`W_{\\lambda} = [\\lambda_{fn}\\mathbf{q}_{fn}]` of shape
+    (3 * n_views, n_points) has rank 4 when the projective depths
+    :math:`\\lambda_{fn}` are correct. Starting from
+    :math:`\\lambda_{fn} = 1`, which corresponds to the affine camera,
+    the rank-4 factorization :math:`W_{\\lambda} \\approx PX` and the depths
+    :math:`\\lambda_{fn} = \\mathbf{q}_{fn}^{\\top}P_{f}\\mathbf{x}_{n} /
+    ||\\mathbf{q}_{fn}||^{2}` are updated alternately.
+    The subspace of each iteration is obtained by a few steps of subspace
+    iteration started from the previous one, so only the first iteration
+    runs a full factorization.
+
+    Args:
+        image_points: Image points of shape (n_views, n_points, 2)
+        method: Backend of the initial factorization.
+            See :py:func:`factorization.factorize`
+        max_iter: Maximum number of iterations
+        tol: The iteration stops when the fraction of the energy of
+            :math:`W_{\\lambda}` outside of the rank-4 subspace changes
+            less than this value
+        n_subspace_iter: Number of subspace iteration steps per iteration
+
+    Returns:
+        tuple: (P, X, depths, n_iter) where
+
+            - P: Projection matrices of shape (n_views, 3, 4) in the
+              original image coordinates
+            - X: Homogeneous 3D points of shape (4, n_points)
+            - depths: Projective depths of shape (n_views, n_points)
+            - n_iter: Number of iterations
+    """
+    n_views, n_points = image_points.shape[0:2]
+    if n_views < 2 or n_points < 4:
+        raise ValueError(
+            "At least 2 views and 4 points are required, but got "
+            "{} views and {} points".format(n_views, n_points))
+
+    q, T = normalize_points(image_points)
+    q_norms = np.square(q).sum(axis=1)
+    depths = balance_depths(np.ones((n_views, n_points)), q)
+
+    U = None
+    energy = np.inf
+    n_iter = max_iter
+    for i in range(max_iter):
+        W = (depths[:, np.newaxis] * q).reshape(3 * n_views, n_points)
+
+        if U is None:
+            U = factorize(W, 4, method).U
+        else:
+            U = subspace_iteration(W, U, n_subspace_iter)
+        X = np.dot(U.T, W)
+
+        new_energy = 1 - squared_norm(X) / squared_norm(W)
+        converged = abs(energy - new_energy) <= tol
+        energy = new_energy
+
+        # least squares depths of all points in all views at once
+        R = np.dot(U, X).reshape(n_views, 3, n_points)
+        depths = np.sum(q * R, axis=1) / q_norms
+        depths = balance_depths(depths, q)
+
+        if converged:
+            n_iter = i + 1
+            break
+
+    # undo the normalization of the image points
+    P = np.matmul(np.linalg.inv(T), U.reshape(n_views, 3, 4))
+    return P, X, depths, n_iter
+
+
+def reprojection_errors(P: np.ndarray, X: np.ndarray,
+                        image_points: np.ndarray) -> np.ndarray:
+    """
+    Distances between the image points and the projections of X
+
+    Args:
+        P: Projection matrices of shape (n_views, 3, 4)
+        X: Homogeneous 3D points of shape (4, n_points)
+        image_points: Image points of shape (n_views, n_points, 2)
+
+    Returns:
+        Errors of shape (n_views, n_points)
+    """
+    Y = np.matmul(P, X)
+    projected = (Y[:, 0:2] / Y[:, 2:3]).transpose(0, 2, 1)
+    return np.linalg.norm(projected - image_points, axis=2)
+
+
+class ProjectiveFactorization(object):
+    """
+    Reconstruction from perspective images by the iterative projective
+    factorization. See :py:func:`projective_factorization`.
+
+    The reconstruction is determined up to a projective transformation.
+    Unlike :py:class:`tomasi_kanade.TomasiKanade`, the image points are not
+    centered, since the perspective projection does not preserve the
+    centroid
+
+    Args:
+        method (str): Backend of the initial factorization
+        max_iter (int): Maximum number of iterations
+        tol (float): Tolerance of the convergence
+    """
+
+    def __init__(self, method="economy", max_iter=100, tol=1e-10):
+        self.method = method
+        self.max_iter = max_iter
+        self.tol = tol
+
+        self.measurements = MeasurementBuffer()
+
+        self.depths = None
+        self.n_iter = None
+
+    def add_image_points(self, image_points: np.ndarray):
+        """
+        Add 2D image points of shape (n_points, 2)
+        """
+        self.add_image_points_batch(image_points[np.newaxis])
+
+    def add_image_points_batch(self, image_points: np.ndarray):
+        """
+        Add 2D image points of shape (n_views, n_points, 2)
+        """
+        n_views, n_points = image_points.shape[0:2]
+        rows = self.measurements.allocate(2 * n_views, n_points)
+        rows.reshape(n_views, 2, n_points)[:] = \
+            image_points.transpose(0, 2, 1)
+
+    @property
+    def image_points(self):
+        """Image points of shape (n_views, n_points, 2)"""
+        W = self.measurements.data
+        return W.reshape(-1, 2, W.shape[1]).transpose(0, 2, 1)
+
+    def run(self):
+        """
+        Run reconstruction
+
+        Returns:
+            tuple: containing 2 elements:
+
+                - P: Projection matrices of shape (n_views, 3, 4)
+                - X: Homogeneous 3D points of shape (n_points, 4)
+        """
+        P, X, self.depths, self.n_iter = projective_factorization(
+            self.image_points, self.method, self.max_iter, self.tol)
+        return P, X.T
@@ -21,22 +21,119 @@ def random_vector_3d(scale=1.0):
     return scale * v
 
 
-def calculate_rotation(X, Y):
-    S = np.dot(X.T, Y)
+def random_rotation_matrices_3d(n: int) -> np.ndarray:
+    """
+    Generate ``n`` rotation matrices uniformly distributed on
+    :math:`\mathbb{SO}(3)` from normalized Gaussian quaternions
+
+    Returns:
+        Rotation matrices of shape (n, 3, 3)
+    """
+    q = np.random.normal(size=(n, 4))
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    w, x, y, z = q.T
+
+    return np.stack([
+        1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w),
+        2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w),
+        2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)
+    ], axis=1).reshape(n, 3, 3)
+
+
+def random_vectors_3d(n: int, scale=1.0) -> np.ndarray:
+    """
+    Generate ``n`` random 3D vectors in the same way as
+    :py:func:`random_vector_3d`
+
+    Returns:
+        Vectors of shape (n, 3)
+    """
+    v = np.random.uniform(-1, 1, size=(n, 3))
+    v = v / np.linalg.norm(v, axis=1, keepdims=True)
+    return scale * v
+
+
+def project_to_rotations(A: np.ndarray) -> np.ndarray:
+    """
+    Find the nearest rotation matrices of matrices A of shape (..., 3, 3)
+    in the Frobenius norm
+    """
+    U, _, VT = np.linalg.svd(A)
+    d = np.where(np.linalg.det(np.matmul(U, VT)) < 0, -1.0, 1.0)
+    U[..., -1] *= d[..., np.newaxis]
+    return np.matmul(U, VT)
+
+
+def decompose_motion(M: np.ndarray):
+    """
+    Decompose a stacked motion matrix into camera rotations and scales.
+    The two rows of each view and their cross product are projected onto
+    :math:`\mathbb{SO}(3)`, so that noisy motion matrices still give
+    rotation matrices.
+
+    Args:
+        M: Stacked motion matrix of shape (2 * n_views, 3)
+
+    Returns:
+        tuple: (R, s) where
+
+            - R: Rotation matrices of shape (n_views, 3, 3)
+            - s: Scales of the scaled orthographic cameras of shape (n_views,)
+    """
+    A = M.reshape(-1, 2, 3)
+    s = np.sqrt(np.sum(np.square(A), axis=(1, 2)) / 2)
+
+    A = A / s[:, np.newaxis, np.newaxis]
+    c = np.cross(A[:, 0], A[:, 1])
+    R = project_to_rotations(np.concatenate((A, c[:, np.newaxis]), axis=1))
+    return R, s
+
+
+def viewing_directions(M: np.ndarray) -> np.ndarray:
+    """
+    Directions of the optical axes of the cameras, which are the third rows
+    of the rotation matrices given by :py:func:`decompose_motion`
+
+    Returns:
+        Unit vectors of shape (n_views, 3)
+    """
+    R, _ = decompose_motion(M)
+    return R[:, 2]
+
+
+def calculate_rotation(X, Y, allow_reflection=False):
+    """
+    Calculate the rotation R which maximizes
+    :math:`\sum_{i} \mathbf{y}_i^{\top} R \mathbf{x}_i`.
+    X and Y may have leading batch dimensions.
+    If ``allow_reflection`` is False, the sign of the last singular vector is
+    flipped so that :math:`\det(R) = 1`
+    """
+    S = np.matmul(np.swapaxes(X, -1, -2), Y)
 
     U, _, VT = np.linalg.svd(S)  # S = U * Sigma * VT
-    V = VT.T
-    return np.dot(V, U.T)
+    V = np.swapaxes(VT, -1, -2)
+    R = np.matmul(V, np.swapaxes(U, -1, -2))
+
+    if allow_reflection:
+        return R
+
+    d = np.where(np.linalg.det(R) < 0, -1.0, 1.0)
+    V[..., -1] *= d[..., np.newaxis]
+    return np.matmul(V, np.swapaxes(U, -1, -2))
 
 
 def calculate_scaling(X, Y, R):
-    n = np.sum(np.dot(np.dot(y, R), x) for x, y in zip(X, Y))
-    d = np.sum(X * X)  # equivalent to sum([dot(x, x) for x in X])
+    # equivalent to sum([dot(dot(y, R), x) for x, y in zip(X, Y)])
+    n = np.sum(Y * np.matmul(X, np.swapaxes(R, -1, -2)), axis=(-2, -1))
+    # equivalent to sum([dot(x, x) for x in X])
+    d = np.sum(X * X, axis=(-2, -1))
     return n / d
 
 
 def calculate_translation(s, R, p, q):
-    return q - s * np.dot(R, p)
+    s = np.asarray(s)[..., np.newaxis]
+    return q - s * np.matmul(R, p[..., np.newaxis])[..., 0]
 
 
 class LeastSquaresRigidMotion(object):
@@ -56,26 +153,33 @@ class LeastSquaresRigidMotion(object):
     >>> s, R, t = LeastSquaresRigidMotion(P, Q).solve()
     >>> P = transform(s, R, t, P)
 
+    P and Q can also be stacks of point sets of shape
+    (n_sets, n_image_points, n_channels). In this case all the sets are
+    aligned at once and s, R and t are stacked along the first axis.
+
     See :cite:`zinsser2005point` for the detailed method.
 
         .. bibliography:: refs.bib
     """
 
-    def __init__(self, P: np.ndarray, Q: np.ndarray):
+    def __init__(self, P: np.ndarray, Q: np.ndarray, allow_reflection=False):
         """
         Args:
             P: Set of points of shape (n_image_points, n_channels)
                 to be transformed
             Q: Set of points of shape (n_image_points, n_channels)
                 to be used as a reference
+            allow_reflection: If False, R is restricted to rotations
+                whose determinant is 1
         """
 
         if P.shape != Q.shape:
             raise ValueError("P and Q must be the same shape")
 
-        self.n_features = P.shape[1]
+        self.n_features = P.shape[-1]
         self.P = P
         self.Q = Q
+        self.allow_reflection = allow_reflection
 
     def solve(self):
         """
@@ -88,13 +192,13 @@ class LeastSquaresRigidMotion(object):
                 - :math:`\mathbf{t}`: translation vector
         """
 
-        mean_p = np.mean(self.P, axis=0)
-        mean_q = np.mean(self.Q, axis=0)
+        mean_p = np.mean(self.P, axis=-2)
+        mean_q = np.mean(self.Q, axis=-2)
 
-        X = self.P - mean_p
-        Y = self.Q - mean_q
+        X = self.P - mean_p[..., np.newaxis, :]
+        Y = self.Q - mean_q[..., np.newaxis, :]
 
-        R = calculate_rotation(X, Y)
+        R = calculate_rotation(X, Y, self.allow_reflection)
         s = calculate_scaling(X, Y, R)
         t = calculate_translation(s, R, mean_p, mean_q)
 
@@ -117,13 +221,15 @@ def transform(s: float, R: np.ndarray,
         t: Translation vector
         P: Points to be transformed of shape (n_image_points, n_channels)
 
+    s, R, t and P can have a leading batch dimension
+    as returned by :py:class:`LeastSquaresRigidMotion`
+
     Returns:
         Transformed vector
     """
 
-    if np.ndim(t) == 1:
-        t = t.reshape(-1, 1)  # align the dimension
-
-    P = s * np.dot(R, P.T) + t
+    s = np.asarray(s)
+    t = np.reshape(t, s.shape + (-1,))  # align the dimension
 
-    return P.T
+    P = s[..., np.newaxis, np.newaxis] * np.matmul(P, np.swapaxes(R, -1, -2))
+    return P + t[..., np.newaxis, :]
@@ -0,0 +1,120 @@
+import numpy as np
+
+from factorization import factorize
+
+
+def huber_weights(r: np.ndarray, c=1.345) -> np.ndarray:
+    """IRLS weights of the Huber loss for normalized residuals r"""
+    r = np.abs(r)
+    return np.where(r <= c, 1.0, c / np.maximum(r, c))
+
+
+def cauchy_weights(r: np.ndarray, c=2.385) -> np.ndarray:
+    """IRLS weights of the Cauchy loss for normalized residuals r"""
+    return 1.0 / (1.0 + np.square(r / c))
+
+
+WEIGHT_FUNCTIONS = {
+    "huber": huber_weights,
+    "cauchy": cauchy_weights,
+}
+
+
+def robust_scale(r: np.ndarray) -> float:
+    """
+    Scale of residuals estimated by the median absolute deviation,
+    which is consistent with the standard deviation of Gaussian noise
+    """
+    return 1.4826 * np.median(np.abs(r))
+
+
+def normalized_residuals(r: np.ndarray) -> np.ndarray:
+    scale = robust_scale(r)
+    if scale == 0:
+        return np.zeros_like(r)
+    return r / scale
+
+
+def robust_factorization(W: np.ndarray, rank=3, loss="huber",
+                         method="economy", max_iter=20, tol=1e-3):
+    """
+    Factorize a measurement matrix as
+    :math:`W \\approx MX + \\mathbf{t}\\mathbf{1}^{\\top}`
+    by iteratively reweighted least squares.
+
+    Each point (column) and each view (pair of rows) has a weight calculated
+    from the RMS of its residuals, so that mistracked points and corrupted
+    views have little effect on the factorization.
+
+    Args:
+        W: Measurement matrix of shape (2 * n_views, n_points)
+        rank: Rank of the factorization
+        loss: Robust loss which defines the weights.
+            ``"huber"`` or ``"cauchy"``
+        method: Backend of the weighted truncated SVD.
+            See :py:func:`factorization.factorize`
+        max_iter: Maximum number of reweighting iterations
+        tol: The iteration stops when no weight changes more than this value
+
+    Returns:
+        tuple: (M, X, t, point_weights, view_weights, n_iter) where
+
+            - M: Matrix of shape (2 * n_views, rank)
+            - X: Matrix of shape (rank, n_points)
+            - t: Offsets of the rows of shape (2 * n_views,)
+            - point_weights: Weights of shape (n_points,) in [0, 1]
+            - view_weights: Weights of shape (n_views,) in [0, 1]
+            - n_iter: Number of iterations
+    """
+    if loss not in WEIGHT_FUNCTIONS:
+        raise ValueError("loss must be one of {}, but got '{}'".format(
+            tuple(WEIGHT_FUNCTIONS.keys()), loss))
+    weight_function = WEIGHT_FUNCTIONS[loss]
+
+    n_rows, n_points = W.shape
+    point_weights = np.ones(n_points, dtype=W.dtype)
+    view_weights = np.ones(n_rows // 2, dtype=W.dtype)
+
+    # weights are bounded below to keep the unweighting step finite
+    eps = 1e-8
+
+    n_iter = max_iter
+    for i in range(max_iter):
+        # the means of the views are contaminated by outliers as well
+        t = np.dot(W, point_weights) / np.sum(point_weights)
+        Wc = W - t[:, np.newaxis]
+
+        row_weights = np.repeat(np.maximum(view_weights, eps), 2)
+        column_weights = np.maximum(point_weights, eps)
+
+        sqrt_r = np.sqrt(row_weights)[:, np.newaxis]
+        U, s, VT, _ = factorize(sqrt_r * Wc * np.sqrt(column_weights),
+                                rank, method)
+        M = U * s / sqrt_r
+
+        # each column is fitted independently by weighted least squares
+        MTD = M.T * row_weights
+        X = np.linalg.solve(np.dot(MTD, M), np.dot(MTD, Wc))
+
+        E = np.square(Wc - np.dot(M, X))
+        point_residuals = np.sqrt(
+            np.dot(row_weights, E) / np.sum(row_weights))
+        view_residuals = np.sqrt(
+            np.dot(E, column_weights) / np.sum(column_weights))
+        view_residuals = np.sqrt(np.mean(
+            np.square(view_residuals).reshape(-1, 2), axis=1))
+
+        new_point_weights = weight_function(
+            normalized_residuals(point_residuals))
+        new_view_weights = weight_function(
+            normalized_residuals(view_residuals))
+
+        change = max(np.max(np.abs(new_point_weights - point_weights)),
+                     np.max(np.abs(new_view_weights - view_weights)))
+        point_weights = new_point_weights
+        view_weights = new_view_weights
+        if change <= tol:
+            n_iter = i + 1
+            break
+
+    return M, X, t, point_weights, view_weights, n_iter
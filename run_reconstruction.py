@@ -2,24 +2,17 @@ import sys
 
 import numpy as np
 
-from plyfile import PlyData
-
-from matplotlib import pyplot as plt
-
+from loaders import read_ply_vertices
 from tomasi_kanade import TomasiKanade
-from visualization import plot3d, plot_result
 import rigid_motion
 
 
 def read_object(filename):
-    """Read a 3D object from a PLY file"""
-    ply = PlyData.read(filename)
-
-    vertex = ply['vertex']
-
-    x, y, z = [vertex[t] for t in ('x', 'y', 'z')]
-
-    return np.vstack((x, y, z)).T
+    """
+    Read a 3D object from a PLY file.
+    See :py:func:`loaders.read_ply_vertices`
+    """
+    return read_ply_vertices(filename)
 
 
 def normalize_object_size(X):
@@ -109,16 +102,48 @@ def take_picture(target_object: Object3D, camera: Camera, noise_std=0.0):
     return image_points + noise
 
 
-def to_viewpoints(M):
-    x = np.array([1, 0, 0])
+def take_pictures(target_object: Object3D, intrinsic_parameters: np.ndarray,
+                  rotations: np.ndarray, translations: np.ndarray,
+                  noise_std=0.0):
+    """
+    Project 3D points in ``target_object`` onto the image planes of
+    multiple cameras at once
+
+    Args:
+        target_object: Object to be seen from the cameras
+        intrinsic_parameters: Intrinsic camera matrix shared by the cameras
+        rotations: Camera rotations of shape (n_views, 3, 3)
+        translations: Camera translations of shape (n_views, 3)
+        noise_std: Standard deviation of noise added in the observation process
 
-    def to_viewpoint(M):
-        m = np.cross(M[0], M[1])
-        R = np.vstack((M, m))
-        return np.dot(R, x)
+    Returns:
+        Image points of shape (n_views, 2, n_points).
+        ``reshape(-1, n_points)`` of the returned array is the
+        (uncentered) measurement matrix
+    """
+
+    K = intrinsic_parameters
+    KR = np.matmul(K, rotations)  # (n_views, 2, 3)
+    Kt = np.dot(translations, K.T)  # (n_views, 2)
+
+    # project all points onto all image planes in one contraction
+    image_points = np.matmul(KR, target_object.X.T)
+    image_points += Kt[:, :, np.newaxis]
+
+    if noise_std == 0.0:
+        return image_points
 
-    F = M.shape[0] // 2
-    return np.array([to_viewpoint(M_) for M_ in np.split(M, F)])
+    image_points += np.random.normal(0, noise_std, size=image_points.shape)
+    return image_points
+
+
+def to_viewpoints(M):
+    """
+    Calculate a point representing each viewpoint from the stacked motion
+    matrix M of shape (2 * n_views, 3)
+    """
+    R, _ = rigid_motion.decompose_motion(M)
+    return R[:, :, 0]  # equivalent to dot(R, [1, 0, 0]) for each view
 
 
 def main():
@@ -151,22 +176,20 @@ def main():
     noise_std = 0.0
 
     target_object = Object3D(X_true)  # Create the target object
-    camera = Camera(intrinsic_parameters)  # Camera object to observe the target
 
     # The ground truth object `X_true` is passed to the TomasiKanade method,
     # though, this is used only for the evaluation, not reconstruction
     tomasi_kanade = TomasiKanade(X_eval=X_true, learning_rate=0.0027)
 
-    for i in range(n_views):
-        # Generate a random camera pose
-        R = rigid_motion.random_rotation_matrix_3d()
-        t = rigid_motion.random_vector_3d()
-        camera.set_pose(R, t)
+    # Generate random camera poses
+    R = rigid_motion.random_rotation_matrices_3d(n_views)
+    t = rigid_motion.random_vectors_3d(n_views)
 
-        # Observe the 3D object by projecting it onto the image plane
-        image_points = take_picture(target_object, camera, noise_std)
+    # Observe the 3D object from all the viewpoints at once
+    image_points = take_pictures(target_object, intrinsic_parameters,
+                                 R, t, noise_std)
 
-        tomasi_kanade.add_image_points(image_points)
+    tomasi_kanade.add_image_points_batch(image_points.transpose(0, 2, 1))
 
     # Run reconstruction
     # M is a stacked motion matrices
@@ -175,6 +198,10 @@ def main():
 
     V = to_viewpoints(M)
 
+    # matplotlib is imported only when the result is plotted
+    from matplotlib import pyplot as plt
+    from visualization import plot3d, plot_result
+
     plot3d(X, azim=180, elev=90)
     plot_result(X, V)
     plt.show()
@@ -0,0 +1,190 @@
+import numpy as np
+
+from factorization import factorize
+from metric_upgrade import LinearAffineCorrection
+from rigid_motion import LeastSquaresRigidMotion, transform
+
+
+class SlidingWindowReconstruction(object):
+    """
+    Reconstruction of an unbounded sequence from the last
+    ``window_size`` views only.
+
+    The views are kept in a ring buffer of shape
+    (window_size, 2, n_points), so the memory does not grow with the length
+    of the sequence. Each call of :py:meth:`run` factorizes the current
+    window and aligns the result to the previous one by
+    :py:class:`rigid_motion.LeastSquaresRigidMotion` on the points
+    reconstructed in both windows, so that all windows share the frame of
+    the first one.
+
+    Examples:
+
+    >>> reconstruction = SlidingWindowReconstruction(window_size=30)
+    >>> for i, image_points in enumerate(stream):
+    ...     reconstruction.add_image_points(image_points)
+    ...     if i % 10 == 9:
+    ...         M, X = reconstruction.run()
+
+    Args:
+        window_size (int): Number of the latest views used
+        method (str): Backend of the factorization.
+            See :py:func:`factorization.factorize`
+        min_shared_points (int): Minimum number of points shared by
+            consecutive windows to align them
+    """
+
+    def __init__(self, window_size=50, method="economy",
+                 min_shared_points=3):
+        if window_size < 2:
+            raise ValueError("window_size must be at least 2")
+
+        self.window_size = window_size
+        self.method = method
+        self.min_shared_points = min_shared_points
+
+        self.image_points = None  # ring buffer of shape (K, 2, n_points)
+        self.visibility = None  # ring buffer of shape (K, n_points)
+        self.n_views = 0
+
+        # points in the global frame of shape (n_points, 3), and the points
+        # reconstructed in the last window
+        self.points = None
+        self.reconstructed = None
+
+        self.n_windows = 0
+
+    def add_image_points(self, image_points: np.ndarray,
+                         mask: np.ndarray = None):
+        """
+        Add 2D image points of shape (n_points, 2).
+        See :py:meth:`tomasi_kanade.TomasiKanade.add_image_points`
+        """
+        if mask is not None:
+            mask = mask[np.newaxis]
+        self.add_image_points_batch(image_points[np.newaxis], mask)
+
+    def add_image_points_batch(self, image_points: np.ndarray,
+                               mask: np.ndarray = None):
+        """
+        Add 2D image points of shape (n_views, n_points, 2).
+        Only the last ``window_size`` views are kept
+        """
+        n_views, n_points = image_points.shape[0:2]
+
+        if self.image_points is None:
+            K = self.window_size
+            self.image_points = np.empty((K, 2, n_points))
+            self.visibility = np.zeros((K, n_points), dtype=bool)
+            self.points = np.full((n_points, 3), np.nan)
+            self.reconstructed = np.zeros(n_points, dtype=bool)
+        elif n_points != self.image_points.shape[2]:
+            raise ValueError(
+                "Expected {} points but got {}".format(
+                    self.image_points.shape[2], n_points))
+
+        visible = ~np.isnan(image_points).any(axis=2)
+        if mask is not None:
+            visible &= mask
+
+        # views older than the window are not written at all
+        image_points = image_points[-self.window_size:]
+        visible = visible[-self.window_size:]
+        first = self.n_views + n_views - image_points.shape[0]
+        slots = np.arange(first, self.n_views + n_views) % self.window_size
+
+        self.image_points[slots] = image_points.transpose(0, 2, 1)
+        self.visibility[slots] = visible
+        self.n_views += n_views
+
+    @property
+    def window(self):
+        """
+        Slots of the ring buffer of the current window in chronological
+        order
+        """
+        n = min(self.n_views, self.window_size)
+        return np.arange(self.n_views - n, self.n_views) % self.window_size
+
+    def factorize_window(self):
+        """
+        Reconstruct the current window in its own frame from the points
+        observed in all of its views
+
+        Returns:
+            tuple: (M, X, columns) where ``M`` is of shape (2 * n_views, 3),
+            ``X`` is of shape (n_columns, 3) and ``columns`` is the boolean
+            array of the reconstructed points
+        """
+        window = self.window
+        if window.shape[0] < 2:
+            raise ValueError("At least 2 views are required")
+
+        columns = self.visibility[window].all(axis=0)
+        if np.count_nonzero(columns) < 4:
+            raise ValueError(
+                "At least 4 points observed in all views of the window "
+                "are required")
+
+        P = self.image_points[window][:, :, columns]
+        W = (P - P.mean(axis=2, keepdims=True)).reshape(-1, P.shape[2])
+
+        U, s, VT, _ = factorize(W, 3, self.method)
+        M, X = U * s, VT
+
+        affine_correction = LinearAffineCorrection()
+        affine_correction.optimize(M, X.T)
+        M, X = affine_correction(M, X.T)
+        return M, X, columns
+
+    def align(self, X, columns):
+        """
+        Find the similarity transform from the frame of the current window
+        to the global frame. The metric upgrade determines X only up to a
+        reflection, so both X and its mirror image are aligned and the one
+        with the smaller error is chosen
+
+        Returns:
+            tuple: (s, R, t, sign) which maps ``sign * X`` to the global frame
+        """
+        shared = self.reconstructed[columns]
+        if np.count_nonzero(shared) < self.min_shared_points:
+            raise ValueError(
+                "Consecutive windows share {} points but at least {} are "
+                "required".format(np.count_nonzero(shared),
+                                  self.min_shared_points))
+
+        Q = self.points[columns][shared]
+        P = np.stack((X[shared], -X[shared]))
+        s, R, t = LeastSquaresRigidMotion(P, np.stack((Q, Q))).solve()
+        errors = np.sum(np.square(transform(s, R, t, P) - Q), axis=(1, 2))
+
+        i = np.argmin(errors)
+        return s[i], R[i], t[i], 1 - 2 * i
+
+    def run(self):
+        """
+        Reconstruct the current window in the global frame, and update
+        ``points`` with the reconstructed points
+
+        Returns:
+            tuple: containing 2 elements:
+
+                - M: Motion matrix of shape (2 * n_views, 3) of the views in
+                  the window
+                - X: 3D points in the global frame of shape (n_points, 3).
+                  Points which have never been reconstructed are NaN
+        """
+        M, X, columns = self.factorize_window()
+
+        if self.n_windows > 0:
+            s, R, t, sign = self.align(X, columns)
+            # M X = (sign * M R^T / s)(s R (sign * X) + t) up to the
+            # translation, which is removed by centering the views
+            M = sign * np.dot(M, R.T) / s
+            X = transform(s, R, t, sign * X)
+
+        self.points[columns] = X
+        self.reconstructed = columns
+        self.n_windows += 1
+        return M, self.points
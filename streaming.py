@@ -0,0 +1,261 @@
+import asyncio
+import struct
+import time
+
+import numpy as np
+
+
+# each frame sent to the socket server is the number of points as an
+# unsigned 32 bit integer followed by the (n_points, 2) image points as
+# little endian float64
+HEADER = struct.Struct('<I')
+POINT_DTYPE = np.dtype('<f8')
+
+
+async def read_frame(reader):
+    """
+    Read one frame from a stream
+
+    Returns:
+        Image points of shape (n_points, 2), or None at the end of the stream
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+        n_points, = HEADER.unpack(header)
+        payload = await reader.readexactly(
+            n_points * 2 * POINT_DTYPE.itemsize)
+    except asyncio.IncompleteReadError:
+        return None
+    return np.frombuffer(payload, dtype=POINT_DTYPE).reshape(n_points, 2)
+
+
+def encode_frame(image_points: np.ndarray) -> bytes:
+    """Encode image points of shape (n_points, 2) into a frame"""
+    image_points = np.ascontiguousarray(image_points, dtype=POINT_DTYPE)
+    return HEADER.pack(image_points.shape[0]) + image_points.tobytes()
+
+
+class StreamingReconstructor(object):
+    """
+    Feed frames to :py:class:`tomasi_kanade.TomasiKanade` from asyncio
+    producers and reconstruct periodically in the background.
+
+    Frames are put into a bounded queue, so producers wait when adding the
+    frames to the measurement matrix falls behind. The consumer moves the
+    queued frames into the measurement matrix in batches. A reconstruction
+    is started in an executor every ``every_n_frames`` frames or
+    ``every_seconds`` seconds, and at most one reconstruction runs at a
+    time. Each reconstruction runs on a
+    :py:meth:`tomasi_kanade.TomasiKanade.snapshot` of the views added so
+    far, so the consumer keeps adding frames while it runs.
+
+    Examples:
+
+    >>> reconstructor = StreamingReconstructor(
+    ...     TomasiKanade(solver="linear"), every_n_frames=30)
+    >>> task = asyncio.ensure_future(reconstructor.consume())
+    >>> for image_points in frames:
+    ...     await reconstructor.put(image_points)
+    >>> await reconstructor.close()
+    >>> await task
+    >>> M, X = reconstructor.latest_result
+
+    Args:
+        tomasi_kanade (tomasi_kanade.TomasiKanade): Reconstruction to feed
+        every_n_frames (int): Reconstruct after this number of new frames
+        every_seconds (float): Reconstruct after this number of seconds
+            if new frames have arrived
+        max_queue_size (int): Number of frames which can be queued before
+            producers wait
+        max_batch_size (int): Maximum number of frames added at once
+        executor: Executor which runs the reconstruction. The default
+            executor of the event loop is used if None
+        on_result: Function called with (M, X) after each reconstruction.
+            The snapshot which produced the result is kept in
+            ``latest_reconstruction``
+    """
+
+    def __init__(self, tomasi_kanade, every_n_frames=None,
+                 every_seconds=None, max_queue_size=64, max_batch_size=32,
+                 executor=None, on_result=None):
+        if every_n_frames is None and every_seconds is None:
+            raise ValueError(
+                "Either every_n_frames or every_seconds must be given")
+
+        self.tomasi_kanade = tomasi_kanade
+        self.every_n_frames = every_n_frames
+        self.every_seconds = every_seconds
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self.on_result = on_result
+
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+
+        self.running = None  # future of the running reconstruction
+        self.running_reconstruction = None  # snapshot being run
+
+        self.n_frames = 0
+        self.n_new_frames = 0  # frames added since the last reconstruction
+        self.last_run_time = time.monotonic()
+
+        self.latest_result = None
+        self.latest_reconstruction = None
+        self.error = None  # exception raised by the last reconstruction
+        self.n_runs = 0
+
+    async def put(self, image_points: np.ndarray, mask: np.ndarray = None):
+        """
+        Queue image points of shape (n_points, 2) of one view.
+        This waits while the queue is full
+        """
+        await self.queue.put((image_points, mask))
+
+    async def close(self):
+        """Stop :py:meth:`consume` after the queued frames are added"""
+        await self.queue.put(None)
+
+    def timeout(self):
+        """
+        Seconds until the next scheduled reconstruction, or None if nothing
+        is scheduled. Nothing is scheduled while a reconstruction runs since
+        the next one cannot start before it finishes
+        """
+        if (self.every_seconds is None or self.n_new_frames == 0 or
+                self.running is not None):
+            return None
+        elapsed = time.monotonic() - self.last_run_time
+        return max(self.every_seconds - elapsed, 0)
+
+    def due(self):
+        """True if a reconstruction should be started"""
+        if self.n_new_frames == 0:
+            return False
+        if (self.every_n_frames is not None and
+                self.n_new_frames >= self.every_n_frames):
+            return True
+        return self.timeout() == 0
+
+    async def next_batch(self):
+        """
+        Wait for frames until the next scheduled reconstruction or until the
+        running reconstruction finishes, and return all frames available
+        without waiting further
+
+        Returns:
+            tuple: (frames, closed) where ``closed`` is True if
+            :py:meth:`close` was called
+        """
+        get = asyncio.ensure_future(self.queue.get())
+        waited = {get}
+        if self.running is not None:
+            waited.add(self.running)
+        await asyncio.wait(waited, timeout=self.timeout(),
+                           return_when=asyncio.FIRST_COMPLETED)
+        if not get.done():
+            # Queue.get leaves the item in the queue when it is cancelled
+            get.cancel()
+            return [], False
+
+        items = [get.result()]
+        while len(items) < self.max_batch_size and not self.queue.empty():
+            items.append(self.queue.get_nowait())
+
+        closed = items[-1] is None
+        frames = [item for item in items if item is not None]
+        for item in items:
+            self.queue.task_done()
+        return frames, closed
+
+    def add_frames(self, frames):
+        """Add frames to the measurement matrix at once"""
+        if len(frames) == 0:
+            return
+        image_points = np.stack([points for points, _ in frames])
+        if all(mask is None for _, mask in frames):
+            mask = None
+        else:
+            mask = np.stack([
+                np.ones(points.shape[0], dtype=bool) if mask is None
+                else mask for points, mask in frames])
+        self.tomasi_kanade.add_image_points_batch(image_points, mask)
+        self.n_frames += len(frames)
+        self.n_new_frames += len(frames)
+
+    def start_run(self):
+        """
+        Start a reconstruction of a snapshot of the views added so far in
+        the executor
+        """
+        loop = asyncio.get_running_loop()
+        self.n_new_frames = 0
+        self.last_run_time = time.monotonic()
+        self.running_reconstruction = self.tomasi_kanade.snapshot()
+        self.running = loop.run_in_executor(self.executor,
+                                            self.running_reconstruction.run)
+
+    async def wait_run(self):
+        """Wait for the running reconstruction and store its result"""
+        future, reconstruction = self.running, self.running_reconstruction
+        # asyncio.wait does not raise the exception of the future
+        await asyncio.wait([future])
+        self.running = None
+        self.running_reconstruction = None
+
+        if future.cancelled():
+            return
+
+        # a failed reconstruction does not stop the ingestion.
+        # The error is kept until the next reconstruction
+        self.error = future.exception()
+        if self.error is not None:
+            return
+
+        self.latest_result = future.result()
+        self.latest_reconstruction = reconstruction
+        self.n_runs += 1
+        if self.on_result is not None:
+            self.on_result(*self.latest_result)
+
+    async def consume(self):
+        """
+        Move queued frames into the measurement matrix and start
+        reconstructions as scheduled, until :py:meth:`close` is called.
+        Before returning, the frames added after the last reconstruction
+        are reconstructed as well
+        """
+        closed = False
+        while not closed:
+            frames, closed = await self.next_batch()
+            self.add_frames(frames)
+
+            if self.running is not None and self.running.done():
+                await self.wait_run()
+            if self.running is None and self.due():
+                self.start_run()
+
+        if self.running is not None:
+            await self.wait_run()
+        if self.n_new_frames > 0:
+            self.start_run()
+            await self.wait_run()
+
+    async def handle_client(self, reader, writer):
+        """Read frames from one client until it disconnects"""
+        try:
+            while True:
+                image_points = await read_frame(reader)
+                if image_points is None:
+                    break
+                await self.put(image_points)
+        finally:
+            writer.close()
+
+    async def serve_unix(self, path):
+        """
+        Start a server which accepts frames encoded by
+        :py:func:`encode_frame` on the Unix socket ``path``
+
+        Returns:
+            asyncio.AbstractServer: The server
+        """
+        return await asyncio.start_unix_server(self.handle_client, path)
@@ -1,6 +1,23 @@
+import copy
+
 import numpy as np
 
-from affine_correction import AffineCorrection
+from bundle_adjustment import refine_reconstruction
+from cache import content_hash
+from factorization import factorize
+from instrumentation import stage
+from landmarks import residual_energy, select_landmarks, solve_points
+from measurement import MeasurementBuffer
+from missing_data import factorize_missing
+from out_of_core import factorize_blocks, recover_points
+from robust import robust_factorization
+from metric_upgrade import (LinearAffineCorrection,
+                            SecondOrderAffineCorrection)
+
+
+# Attributes set by the factorization, which are stored in the cache
+FACTORIZATION_OUTPUTS = ('discarded_energy', 'offsets',
+                         'point_weights', 'view_weights')
 
 
 class TomasiKanade(object):
@@ -12,28 +29,210 @@ class TomasiKanade(object):
             the reconstructed model
         learning_rate (float): Hyperparameter used in the affine correction
             which run in the reconstruction process
+        method (str): Backend used to factorize the measurement matrix.
+            See :py:func:`factorization.factorize`
+        solver (str): Solver of the affine correction.
+            ``"sgd"`` runs :py:class:`affine_correction.AffineCorrection`,
+            ``"linear"`` runs the closed-form
+            :py:class:`metric_upgrade.LinearAffineCorrection` and
+            ``"lm"`` runs the full-batch Levenberg-Marquardt method
+            :py:class:`metric_upgrade.SecondOrderAffineCorrection`.
+            Only ``"sgd"`` requires Chainer
+        robust_loss (str): If ``"huber"`` or ``"cauchy"``, the measurement
+            matrix is factorized by :py:func:`robust.robust_factorization`
+            to suppress outlier tracks and views
+        profiler (instrumentation.Profiler): Profiler which records the
+            stages of the reconstruction. Nothing is recorded if None
+        verbose (bool): Print the progress of the SGD solver
+        cache (cache.FactorizationCache): Cache of the factorization
+            results. If given, :py:meth:`run` skips the factorization of
+            a measurement matrix factorized before with the same options,
+            and only the affine correction is run again.
+            ``discarded_energy``, ``offsets``, ``point_weights`` and
+            ``view_weights`` are restored from the cache on a hit
+        dtype: Data type of the measurement matrix and the factors.
+            ``np.float32`` halves the memory of the measurement matrix.
+            The metric upgrade is always solved in double precision
+        refine (bool): Refine the cameras and the points by
+            :py:func:`bundle_adjustment.bundle_adjustment` after the
+            affine correction. The views are modeled as scaled orthographic
+            cameras. With ``robust_loss``, the observations are weighted by
+            the weights of the robust factorization
+        landmarks (int): If given, only this number of points selected by
+            :py:func:`landmarks.select_landmarks` are factorized, and the
+            other points are recovered by least squares against the motion
+            matrix. This requires all points to be observed
+        landmark_method (str): Method to select the landmarks.
+            ``"random"``, ``"farthest"`` or ``"leverage"``
+        chunk_size (int): Number of points recovered at once when
+            ``landmarks`` is given
     """
 
-    def __init__(self, X_eval=None, learning_rate=4e-3):
-        self.affine_correction = AffineCorrection(X_eval, learning_rate)
-        self.image_points = []
+    def __init__(self, X_eval=None, learning_rate=4e-3, method="economy",
+                 solver="sgd", robust_loss=None, profiler=None,
+                 verbose=True, dtype=np.float64, cache=None, refine=False,
+                 landmarks=None, landmark_method="random", chunk_size=None):
+        if solver not in ("sgd", "linear", "lm"):
+            raise ValueError(
+                "solver must be 'sgd', 'linear' or 'lm', "
+                "but got '{}'".format(solver)
+            )
+
+        self.X_eval = X_eval
+        self.learning_rate = learning_rate
+        self.solver = solver
+        self.verbose = verbose
+        self._affine_correction = None
+
+        self.dtype = np.dtype(dtype)
+        self.measurements = MeasurementBuffer(self.dtype)
+        self.method = method
+        self.robust_loss = robust_loss
+        self.profiler = profiler
+        self.cache = cache
+        self.refine = refine
+        self.landmarks = landmarks
+        self.landmark_method = landmark_method
+        self.chunk_size = chunk_size
+
+        # boolean matrix of shape (n_views, n_points) which indicates
+        # observed points. This is None while all points are observed
+        self.visibility = None
+
+        # fraction of the spectral energy of the measurement matrix
+        # discarded by the rank-3 factorization in the last run.
+        # This is not calculated when some points are unobserved
+        self.discarded_energy = None
+
+        # offsets of the rows of the measurement matrix estimated by the
+        # missing-data or robust factorization, which compensate the bias
+        # of the means of the views
+        self.offsets = None
+
+        # inlier weights in [0, 1] estimated by the robust factorization
+        self.point_weights = None
+        self.view_weights = None
 
-    def add_image_points(self, image_points: np.ndarray):
+        # translations of the views of shape (n_views, 2) estimated by
+        # the refinement
+        self.translations = None
+
+    @property
+    def affine_correction(self):
+        """
+        The affine correction selected by ``solver``. It is created on first
+        access so that Chainer is not imported until the SGD solver is used
+        """
+        if self._affine_correction is not None:
+            return self._affine_correction
+
+        if self.solver == "sgd":
+            from affine_correction import AffineCorrection
+            self._affine_correction = AffineCorrection(
+                self.X_eval, self.learning_rate, verbose=self.verbose)
+        elif self.solver == "lm":
+            self._affine_correction = SecondOrderAffineCorrection(self.X_eval)
+        else:
+            self._affine_correction = LinearAffineCorrection(self.X_eval)
+        return self._affine_correction
+
+    def add_image_points(self, image_points: np.ndarray,
+                         mask: np.ndarray = None):
         """
         Add 2D image points to form a measurement matrix
 
         Args:
-            image_points: Image points of shape (n_points, 2)
+            image_points: Image points of shape (n_points, 2).
+                Points which contain NaN are treated as unobserved
+            mask: Boolean array of shape (n_points,) which is False for
+                points not observed in this view
+        """
+
+        if mask is not None:
+            mask = mask[np.newaxis]
+        self.add_image_points_batch(image_points[np.newaxis], mask)
+
+    def add_image_points_batch(self, image_points: np.ndarray,
+                               mask: np.ndarray = None):
+        """
+        Add 2D image points observed from multiple views at once
+
+        Args:
+            image_points: Image points of shape (n_views, n_points, 2).
+                Points which contain NaN are treated as unobserved
+            mask: Boolean array of shape (n_views, n_points) which is False
+                for points not observed in the corresponding view
+        """
+
+        with stage(self.profiler, "centering") as record:
+            rows = self.append_views(image_points, mask)
+            record.observe(rows)
+
+    def append_views(self, image_points, mask):
+        """
+        Center the image points and write them into the measurement matrix
+
+        Returns:
+            The rows written, of shape (n_views, 2, n_points)
+        """
+        n_views, n_points = image_points.shape[0:2]
+
+        visible = ~np.isnan(image_points).any(axis=2)
+        if mask is not None:
+            visible &= mask
+
+        if self.visibility is None and not visible.all():
+            # all views added so far are fully observed
+            self.visibility = MeasurementBuffer(dtype=bool)
+            n_added = len(self.measurements) // 2
+            self.visibility.allocate(n_added, n_points)[:] = True
+
+        rows = self.measurements.allocate(2 * n_views, n_points)
+        rows = rows.reshape(n_views, 2, n_points)
+
+        if self.visibility is None:
+            mean = np.mean(image_points, axis=1, keepdims=True,
+                           dtype=self.dtype)
+            # write the centered points directly into the measurement matrix
+            np.subtract(image_points.transpose(0, 2, 1),
+                        mean.transpose(0, 2, 1), out=rows)
+            return rows
+
+        self.visibility.append(visible)
+
+        # center by the mean of the observed points and fill the
+        # unobserved entries with 0
+        visible = visible[:, np.newaxis]
+        points = image_points.transpose(0, 2, 1)
+        points = np.where(visible, points, 0)
+        count = np.maximum(visible.sum(axis=2, keepdims=True), 1)
+        mean = points.sum(axis=2, keepdims=True) / count
+        np.subtract(points, mean, out=rows)
+        rows *= visible
+        return rows
+
+    def snapshot(self):
+        """
+        Copy of this reconstruction which holds copies of the views added so
+        far. The copy can be run in another thread while views are added to
+        this one. The affine correction and the cache are shared
         """
+        # create the affine correction first so that the copies share it
+        self.affine_correction
 
-        mean = np.mean(image_points, axis=0, keepdims=True)
-        image_points = image_points - mean
-        self.image_points.append(image_points.T)
+        tomasi_kanade = copy.copy(self)
+        tomasi_kanade.measurements = self.measurements.copy()
+        if self.visibility is not None:
+            tomasi_kanade.visibility = self.visibility.copy()
+        return tomasi_kanade
 
     @property
     def measurement_matrix(self):
-        """Measurement matrix of shape (2 * n_views, n_points)"""
-        return np.vstack(self.image_points)
+        """
+        Measurement matrix of shape (2 * n_views, n_points).
+        This is a view of the internal buffer and is not copied
+        """
+        return self.measurements.data
 
     def run(self):
         """
@@ -47,22 +246,168 @@ class TomasiKanade(object):
                 - X: Reconstructed 3D points of shape (n, 3) where `n` is
                   the number of points in the reconstructed point cloud
         """
-        W = self.measurement_matrix
-        u, s, vh = np.linalg.svd(W, full_matrices=True)
+        with stage(self.profiler, "stacking") as record:
+            W = self.measurement_matrix
+            record.observe(W)
+
+        if self.cache is None:
+            with stage(self.profiler, "factorization") as record:
+                M, X = self.factorize(W)
+                record.observe(M, X)
+            M, X = self.correct(M, X)
+            return self.refine_result(W, M, X)
+
+        visibility = None if self.visibility is None else self.visibility.data
+        key = content_hash(W, visibility, method=self.method,
+                           robust_loss=self.robust_loss,
+                           landmarks=self.landmarks,
+                           landmark_method=self.landmark_method)
+        entry = self.cache.get(key)
+        if entry is None:
+            with stage(self.profiler, "factorization") as record:
+                M, X = self.factorize(W)
+                record.observe(M, X)
+            M, X, k = self.normalize(M, X)
+            self.cache.put(key, M, X, k, **{
+                name: getattr(self, name) for name in FACTORIZATION_OUTPUTS})
+        else:
+            M, X, k, outputs = entry
+            for name in FACTORIZATION_OUTPUTS:
+                setattr(self, name, outputs.get(name))
+
+        M, X = self.apply_affine_correction(M, X)
+        return self.refine_result(W, M, X)
+
+    def refine_result(self, W, M, X):
+        """
+        Refine M and X against the measurement matrix W if ``refine`` is
+        True. Otherwise M and X are returned as they are
+        """
+        if not self.refine:
+            return M, X
+
+        with stage(self.profiler, "bundle_adjustment") as record:
+            visibility = None if self.visibility is None \
+                else self.visibility.data
+            M_, X_, self.translations = refine_reconstruction(
+                W, M, X, visibility, self.offsets,
+                self.point_weights, self.view_weights)
+            M_ = M_.astype(M.dtype, copy=False)
+            X_ = X_.astype(X.dtype, copy=False)
+            record.observe(M_, X_)
+        return M_, X_
+
+    def factorize(self, W):
+        """
+        Factorize the measurement matrix W into M of shape (2 * n_views, 3)
+        and X of shape (3, n_points) with the configured backend
+        """
+        fully_observed = (self.visibility is None or
+                          self.visibility.data.all())
+
+        if not fully_observed:
+            if self.robust_loss is not None:
+                raise ValueError(
+                    "The robust factorization requires all points "
+                    "to be observed"
+                )
+            if self.landmarks is not None:
+                raise ValueError(
+                    "The landmark factorization requires all points "
+                    "to be observed"
+                )
+            mask = np.repeat(self.visibility.data, 2, axis=0)
+            M, X, self.offsets, _ = factorize_missing(W, mask)
+            X = X.T
+            self.discarded_energy = None
+        elif self.robust_loss is not None:
+            M, X, self.offsets, self.point_weights, self.view_weights, _ = \
+                robust_factorization(W, 3, self.robust_loss, self.method)
+            self.discarded_energy = None
+        elif self.landmarks is not None:
+            indices = select_landmarks(W, self.landmarks,
+                                       self.landmark_method)
+            u, s, _, _ = factorize(W[:, indices], 3, self.method)
+            M = u * s
+            X = solve_points(M, W, self.chunk_size)
+            # the rank-fit diagnostic of the whole matrix, not only of
+            # the landmark columns
+            self.discarded_energy = residual_energy(W, M, X)
+        else:
+            u, s, vh, self.discarded_energy = factorize(W, 3, self.method)
+            M = u * s
+            X = vh
+
+        return M.astype(W.dtype, copy=False), X.astype(W.dtype, copy=False)
+
+    def run_blocks(self, blocks, workers=1):
+        """
+        Run reconstruction from a measurement matrix split into column
+        blocks of points, without loading the whole matrix into memory.
+        See :py:func:`out_of_core.factorize_blocks`
+
+        Args:
+            blocks: Sequence of column blocks of shape (2 * n_views, n_b),
+                given as arrays or paths to ``.npy`` files
+            workers: Number of threads which process the blocks
+
+        Returns:
+            tuple: (M, X) in the same format as :py:meth:`run`
+        """
+        with stage(self.profiler, "factorization") as record:
+            U, s, mean, self.discarded_energy = factorize_blocks(
+                blocks, 3, workers)
+            M = U * s
+            X = np.hstack(list(recover_points(blocks, U, s, mean, workers)))
+            M = M.astype(self.dtype, copy=False)
+            X = X.astype(self.dtype, copy=False)
+            record.observe(M, X)
+
+        return self.correct(M, X)
+
+    def correct(self, M, X):
+        """
+        Apply the affine correction to the factors :math:`W \\approx MX`
+
+        Args:
+            M: Matrix of shape (2 * n_views, 3)
+            X: Matrix of shape (3, n_points)
+
+        Returns:
+            tuple: (M, X) in the same format as :py:meth:`run`
+        """
+        M, X, k = self.normalize(M, X)
+        return self.apply_affine_correction(M, X)
 
-        u = u[:, 0:3]
-        s = s[0:3]
-        vh = vh[0:3, :]
+    def normalize(self, M, X):
+        """
+        Scale M and X so that the mean norm of the rows of M is 1
 
-        M = u * s
-        X = vh
+        Returns:
+            tuple: (M, X, k) where k is the normalization constant
+        """
+        with stage(self.profiler, "normalization") as record:
+            # normalize the matrix entries to make
+            # the affine correction optimization stable
+            k = np.linalg.norm(M, axis=1).mean()
+            M = M / k
+            X = X * k
+            record.observe(M, X)
+        return M, X, k
 
-        # normalize the matrix entries to make
-        # the affine correction optimization stable
-        k = np.linalg.norm(M, axis=1).mean()
-        M = M / k
-        X = X * k
+    def apply_affine_correction(self, M, X):
+        """
+        Optimize the affine correction for the normalized factors M and X
+        and apply it
+
+        Returns:
+            tuple: (M, X) in the same format as :py:meth:`run`
+        """
+        with stage(self.profiler, "affine_optimization"):
+            self.affine_correction.optimize(M, X.T)
 
-        self.affine_correction.optimize(M, X.T)
+        with stage(self.profiler, "transform") as record:
+            M, X = self.affine_correction(M, X.T)
+            record.observe(M, X)
 
-        return self.affine_correction(M, X.T)
+        return M, X
@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 
 from matplotlib.animation import FuncAnimation
@@ -6,6 +8,96 @@ from matplotlib import pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
 
+def random_decimation_index(n_points: int, budget: int, seed=0):
+    """
+    Indices of ``budget`` points chosen uniformly at random
+    from ``n_points`` points
+    """
+    if n_points <= budget:
+        return np.arange(n_points)
+    rng = np.random.RandomState(seed)
+    return np.sort(rng.choice(n_points, budget, replace=False))
+
+
+def voxel_indices(P: np.ndarray, voxel_size: float):
+    """Indices of the first point in each occupied voxel"""
+    voxels = np.floor((P - P.min(axis=0)) / voxel_size).astype(np.int64)
+    # encode the voxel coordinates into one integer, which is much faster
+    # to sort than the rows of the coordinates
+    keys = np.ravel_multi_index(voxels.T, voxels.max(axis=0) + 1)
+    _, indices = np.unique(keys, return_index=True)
+    return np.sort(indices)
+
+
+def voxel_decimation_index(P: np.ndarray, budget: int, n_iter=16):
+    """
+    Indices of points decimated by a voxel grid whose voxel size is chosen
+    so that the number of occupied voxels does not exceed ``budget``.
+    Unlike random sampling, sparse regions of the cloud are kept.
+
+    Args:
+        P: Points of shape (n_points, 3)
+        budget: Maximum number of points to be kept
+        n_iter: Number of bisection steps on the voxel size
+    """
+    if P.shape[0] <= budget:
+        return np.arange(P.shape[0])
+
+    extent = np.max(P.max(axis=0) - P.min(axis=0))
+    if extent == 0:
+        return np.arange(1)
+
+    # bisection on the logarithm of the voxel size. The grid has at most
+    # budget ** 3 voxels, so the voxel keys fit in 64 bit integers
+    low, high = np.log(extent / budget), np.log(extent)
+    best = voxel_indices(P, extent)
+    for i in range(n_iter):
+        middle = (low + high) / 2
+        indices = voxel_indices(P, np.exp(middle))
+        if len(indices) > budget:
+            low = middle
+        else:
+            high = middle
+            best = indices
+    return best
+
+
+class LevelOfDetail(object):
+    """
+    Cache of decimation indices of a point cloud, so that plotting the
+    same cloud several times decimates it only once per point budget
+
+    Args:
+        P: Points of shape (n_points, 3)
+        method (str): ``"voxel"`` or ``"random"``
+    """
+
+    def __init__(self, P: np.ndarray, method="voxel"):
+        if method not in ("voxel", "random"):
+            raise ValueError(
+                "method must be 'voxel' or 'random', but got '{}'".format(
+                    method))
+        self.P = P
+        self.method = method
+        self.indices = {}
+
+    def index(self, budget: int) -> np.ndarray:
+        """Indices of at most ``budget`` points"""
+        if budget not in self.indices:
+            if self.method == "voxel":
+                indices = voxel_decimation_index(self.P, budget)
+            else:
+                indices = random_decimation_index(self.P.shape[0], budget)
+            self.indices[budget] = indices
+        return self.indices[budget]
+
+    def points(self, budget: int) -> np.ndarray:
+        """At most ``budget`` points of the cloud"""
+        if budget is None or self.P.shape[0] <= budget:
+            return self.P
+        return self.P[self.index(budget)]
+
+
 def object_color(X):
     color = np.mean(np.abs(X), axis=1)
     return color / np.max(color)
@@ -74,7 +166,8 @@ def plot2d(P: np.ndarray, do_annotate=False, color=None):
     ax.set_aspect('equal', 'datalim')
 
 
-def plot3d(P: np.ndarray, do_annotate=False, color=None, elev=45, azim=0):
+def plot3d(P: np.ndarray, do_annotate=False, color=None, elev=45, azim=0,
+           max_points=None, lod=None):
     """
     Plot 3D points
 
@@ -84,8 +177,20 @@ def plot3d(P: np.ndarray, do_annotate=False, color=None, elev=45, azim=0):
         color: Color of points
         elev: Elevation of the viewpoint
         azim: Azimuth angle of the viewpoint
+        max_points: If given, the points are decimated by a voxel grid
+            to at most this number before plotting
+        lod (LevelOfDetail): Cache of the decimation of P. Passing the same
+            object for the same cloud skips the decimation
     """
 
+    if max_points is not None and P.shape[0] > max_points:
+        if lod is None:
+            lod = LevelOfDetail(P)
+        index = lod.index(max_points)
+        P = P[index]
+        if color is not None and np.ndim(color) > 0:
+            color = np.asarray(color)[index]
+
     if color is None:
         color = object_color(P)
 
@@ -104,12 +209,7 @@ def plot3d(P: np.ndarray, do_annotate=False, color=None, elev=45, azim=0):
     set_aspect_equal(ax)
 
 
-def plot_result(X, viewpoints):
-    # Define a color for each point
-
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
-
+def draw_result(ax, X, viewpoints):
     V = viewpoints
     ax.scatter(V[:, 0], V[:, 1], V[:, 2],
                c='r', marker='s', label='viewpoints')
@@ -123,3 +223,79 @@ def plot_result(X, viewpoints):
     ax.legend()
 
     set_aspect_equal(ax)
+
+
+def plot_result(X, viewpoints, max_points=None, max_viewpoints=None,
+                lod=None):
+    """
+    Plot the reconstructed points and the viewpoints
+
+    Args:
+        X: Reconstructed points of shape (n_points, 3)
+        viewpoints: Viewpoints of shape (n_views, 3)
+        max_points: If given, the points are decimated by a voxel grid
+            to at most this number before plotting
+        max_viewpoints: If given, at most this number of viewpoints
+            chosen at random are plotted
+        lod (LevelOfDetail): Cache of the decimation of X. Passing the same
+            object for the same cloud skips the decimation
+    """
+
+    if lod is None:
+        lod = LevelOfDetail(X)
+
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
+
+    X = lod.points(max_points)
+    viewpoints = LevelOfDetail(viewpoints, "random").points(max_viewpoints)
+    draw_result(ax, X, viewpoints)
+
+
+def save_snapshots(X, viewpoints, directory, angles=((45, 0), (90, 180)),
+                   max_points=100000, max_viewpoints=1000, prefix='snapshot',
+                   dpi=100, lod=None):
+    """
+    Render the reconstructed points and the viewpoints to image files
+    without a display. The figure is drawn once and saved from each of the
+    viewing angles.
+
+    Args:
+        X: Reconstructed points of shape (n_points, 3)
+        viewpoints: Viewpoints of shape (n_views, 3)
+        directory: Directory where the images are saved
+        angles: Sequence of (elevation, azimuth) of the snapshots
+        max_points: Maximum number of points to be rendered
+        max_viewpoints: Maximum number of viewpoints to be rendered
+        prefix: Prefix of the file names
+        dpi: Resolution of the images
+        lod (LevelOfDetail): Cache of the decimation of X. Passing the same
+            object for the same cloud skips the decimation
+
+    Returns:
+        list: Paths to the saved images
+    """
+    # the Agg canvas renders without pyplot and a display
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if lod is None:
+        lod = LevelOfDetail(X)
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d')
+
+    viewpoints = LevelOfDetail(viewpoints, "random").points(max_viewpoints)
+    draw_result(ax, lod.points(max_points), viewpoints)
+
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for elev, azim in angles:
+        ax.view_init(elev, azim)
+        path = os.path.join(
+            directory, '{}-{:g}-{:g}.png'.format(prefix, elev, azim))
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+    return paths